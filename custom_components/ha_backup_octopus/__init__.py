@@ -1,33 +1,76 @@
-from .handlers import AVAILABLE_HANDLERS
+from .handlers import AVAILABLE_HANDLERS, TIMEOUTS_SCHEMA
 from .backup_manager import BackupManager
-from homeassistant.core import HomeAssistant, callback
+from .const import CONF_ENCRYPTION_KEY, CONF_TIMEOUTS
+from .discovery import DeviceRegistryDiscovery
+from homeassistant.core import HomeAssistant, SupportsResponse, callback
 import logging
-from homeassistant.const import EVENT_HOMEASSISTANT_STARTED
+import voluptuous as vol
+from homeassistant.const import EVENT_HOMEASSISTANT_STARTED, EVENT_HOMEASSISTANT_STOP
+from homeassistant.helpers import config_validation as cv
 
 _LOGGER = logging.getLogger(__name__)
 
 DOMAIN = "ha_backup_octopus"
 
+CONFIG_SCHEMA = vol.Schema(
+    {
+        vol.Optional(DOMAIN): vol.Maybe(
+            vol.Schema(
+                {
+                    vol.Optional(CONF_ENCRYPTION_KEY): cv.string,
+                    vol.Optional(CONF_TIMEOUTS): TIMEOUTS_SCHEMA,
+                }
+            )
+        )
+    },
+    extra=vol.ALLOW_EXTRA,
+)
+
+# Entity platforms loaded through discovery (no YAML needed)
+PLATFORMS = ["button", "binary_sensor", "sensor"]
+
 
 async def async_setup(hass: HomeAssistant, config: dict) -> bool:
     """Set up the device backup integration.
 
     This setup creates a BackupManager, registers a service to trigger
-    backups and discovers WLED devices from installed WLED config entries.
+    backups and discovers devices (WLED, Shelly, ESPHome, Tasmota) from
+    installed config entries and the device registry.
     """
     manager = BackupManager(hass)
     hass.data[DOMAIN] = manager
+    # Restore the backup health and the shutdown checkpoint of earlier
+    # runs before devices register
+    await manager.async_load()
+
+    conf = config.get(DOMAIN) or {}
+    # Opt-in encryption of collected artifacts; keep the passphrase in
+    # secrets.yaml, it is needed to decrypt the `.enc` files on restore.
+    # A passphrase set in the options takes precedence.
+    manager.configured_encryption_key = conf.get(CONF_ENCRYPTION_KEY)
+    await manager.async_update_encryption()
+
+    # Optional per handler type timeouts, e.g. `timeouts: {shelly: 30}`;
+    # the options' timeouts are layered on top
+    manager.set_handler_timeouts(conf.get(CONF_TIMEOUTS))
 
     # sentinel removed: diagnostic file write was temporary and has been cleaned up
 
     # Register a service to manually trigger backups: ha_backup_octopus.run_backups
+    # With `plan: true` nothing is written; the plan is returned as the
+    # service response instead.
     async def _run_backups_service(call):
-        await manager.run_backups()
+        if call.data.get("plan", False):
+            return await manager.plan_backups()
+        hass.async_create_task(
+            manager.run_backups(profile=bool(call.data.get("profile", False))))
+        return None
 
     hass.services.async_register(
         DOMAIN,
         "run_backups",
-        lambda call: hass.async_create_task(_run_backups_service(call)),
+        _run_backups_service,
+        supports_response=SupportsResponse.OPTIONAL,
     )
 
     # Discover handlers by asking each available handler class to find
@@ -54,27 +97,42 @@ async def async_setup(hass: HomeAssistant, config: dict) -> bool:
                         handler_cls,
                     )
 
+        # Afterwards pick up matching devices that have no config entry of
+        # the handler's domain; entry-based handlers take precedence.
+        try:
+            manager.discovery = DeviceRegistryDiscovery(hass, manager, AVAILABLE_HANDLERS)
+            manager.discovery.async_start()
+        except Exception:
+            _LOGGER.exception("Device registry discovery failed")
+
     hass.async_create_task(_discover_handlers())
 
-    # Ensure the custom button platform is loaded programmatically so the
-    # UI button entity is created without requiring YAML configuration.
-    async def _delayed_load():
-        try:
-            import asyncio
+    # Let running backups finish (or checkpoint them) when Home Assistant
+    # stops; config entries are not unloaded on stop.
+    async def _async_stop(event) -> None:
+        # a fired listen_once listener is already removed
+        manager.unsub_stop = None
+        await manager.shutdown()
 
-            await asyncio.sleep(1)
-            from homeassistant.helpers import discovery as _discovery
+    manager.unsub_stop = hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _async_stop)
 
-            _LOGGER.info("Loading button platform for %s", DOMAIN)
-            await _discovery.async_load_platform(hass, "button", DOMAIN, {}, config)
-            _LOGGER.info("Requested button platform load for %s", DOMAIN)
-        except Exception:
-            hass.logger.exception("Failed to load button platform for %s", DOMAIN)
+    # Ensure the entity platforms are loaded programmatically so the
+    # button and health sensors are created without YAML configuration.
+    async def _load_platforms():
+        from homeassistant.helpers import discovery as _discovery
 
-    hass.async_create_task(_delayed_load())
+        for platform in PLATFORMS:
+            try:
+                _LOGGER.info("Loading %s platform for %s", platform, DOMAIN)
+                await _discovery.async_load_platform(hass, platform, DOMAIN, {}, config)
+                _LOGGER.info("Requested %s platform load for %s", platform, DOMAIN)
+            except Exception:
+                _LOGGER.exception("Failed to load %s platform for %s", platform, DOMAIN)
 
-    # Note: we rely on `async_load_platform` to create the `button` entity.
-    # Previously a direct fallback added the entity programmatically; that
+    hass.async_create_task(_load_platforms())
+
+    # Note: we rely on `async_load_platform` to create the entities.
+    # Previously a direct fallback added the button programmatically; that
     # approach has been removed in favor of a single discovery path to
     # keep startup behavior predictable.
 
@@ -94,32 +152,48 @@ async def async_setup_entry(hass: HomeAssistant, entry) -> bool:
         # entries carry no extra YAML config for this integration.
         await async_setup(hass, {})
 
+    # Apply the options now and again whenever they are edited; the
+    # running manager picks them up without reloading the integration.
+    manager = hass.data[DOMAIN]
+    manager.apply_options(entry.options)
+    await manager.async_update_encryption()
+    entry.async_on_unload(entry.add_update_listener(_async_options_updated))
+
     return True
 
 
+async def _async_options_updated(hass: HomeAssistant, entry) -> None:
+    """Push edited options to the running BackupManager."""
+    manager = hass.data.get(DOMAIN)
+    if manager is not None:
+        manager.apply_options(entry.options)
+        await manager.async_update_encryption()
+
+
 async def async_unload_entry(hass: HomeAssistant, entry) -> bool:
     """Unload a config entry and clean up resources.
 
-    This will unload the button platform we created and remove the
+    This will unload the entity platforms we created and remove the
     integration data and service registration.
     """
-    # Attempt to unload the platform (button)
-    try:
-        from homeassistant.helpers import discovery as _discovery
-
-        unloaded = await _discovery.async_unload_platform(hass, "button", DOMAIN, entry)
-        _LOGGER.debug("Platform unload result: %s", unloaded)
-    except Exception:
-        # Some HA versions may not support async_unload_platform; try
-        # the component unload path instead.
+    # Attempt to unload the platforms (button, sensors)
+    for platform_name in PLATFORMS:
         try:
-            from homeassistant.helpers import entity_platform as _entity_platform
+            from homeassistant.helpers import discovery as _discovery
 
-            platform = _entity_platform.async_get_platform(hass, "button", DOMAIN)
-            if platform is not None:
-                await platform.async_remove_entities([])
+            unloaded = await _discovery.async_unload_platform(hass, platform_name, DOMAIN, entry)
+            _LOGGER.debug("Platform %s unload result: %s", platform_name, unloaded)
         except Exception:
-            _LOGGER.debug("Could not use platform-specific unload; continuing")
+            # Some HA versions may not support async_unload_platform; try
+            # the component unload path instead.
+            try:
+                from homeassistant.helpers import entity_platform as _entity_platform
+
+                platform = _entity_platform.async_get_platform(hass, platform_name, DOMAIN)
+                if platform is not None:
+                    await platform.async_remove_entities([])
+            except Exception:
+                _LOGGER.debug("Could not use platform-specific unload; continuing")
 
     # Remove service if registered
     try:
@@ -132,6 +206,9 @@ async def async_unload_entry(hass: HomeAssistant, entry) -> bool:
         try:
             manager = hass.data.get(DOMAIN)
             if manager is not None:
+                if manager.unsub_stop is not None:
+                    manager.unsub_stop()
+                    manager.unsub_stop = None
                 try:
                     await manager.shutdown()
                 except Exception:
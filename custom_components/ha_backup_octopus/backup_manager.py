@@ -1,51 +1,635 @@
 import asyncio
+import collections
 import logging
+import os
+import shutil
+import time
+from datetime import timedelta
+
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    BACKUPS_FOLDER,
+    CONF_BANDWIDTH_LIMIT,
+    CONF_CONNECT_TIMEOUT,
+    CONF_ENCRYPTION_KEY,
+    CONF_MAX_CONCURRENCY,
+    CONF_PROBE_TIMEOUT,
+    CONF_READ_TIMEOUT,
+    CONF_REPORT_CSV,
+    CONF_RETENTION_DAYS,
+    CONF_SCHEDULE_HOURS,
+    CONF_STALE_DAYS,
+    CONF_TIMEOUTS,
+    CONF_TOTAL_TIMEOUT,
+    DEFAULT_OPTIONS,
+)
+from .handlers import handler_type
+from .handlers.bandwidth import BandwidthLimiter
+from .handlers.base import parse_timeouts
+from .handlers.http_auth import host_key
+from .handlers.encryption import SALT_SIZE, ArtifactEncryption
+from .health import BackupHealth, device_key
+from .profiling import PROFILES_FOLDER, RunProfiler
+from .report import EVENT_RUN_FINISHED, REPORTS_FOLDER, RunReport, summary_message
+
+try:
+    from homeassistant.helpers.event import async_track_time_interval
+    from homeassistant.helpers.storage import Store
+except Exception:  # pragma: no cover - only available inside Home Assistant
+    async_track_time_interval = None
+    Store = None
 
 _LOGGER = logging.getLogger(__name__)
 
+# Devices a shutdown interrupted; the next run backs them up first
+CHECKPOINT_STORAGE_KEY = "ha_backup_octopus.checkpoint"
+CHECKPOINT_STORAGE_VERSION = 1
+
+# Random scrypt salt of this installation's encryption key
+ENCRYPTION_STORAGE_KEY = "ha_backup_octopus.encryption"
+ENCRYPTION_STORAGE_VERSION = 1
+
+# Seconds shutdown waits for running backups before cancelling them
+SHUTDOWN_TIMEOUT = 30
+
+# Throughput (bytes/s) assumed by plan estimates for unthrottled hosts
+PLAN_ASSUMED_RATE = 1024 * 1024
+
+
+class ConcurrencyLimit:
+    """Semaphore whose limit can be changed while it is in use.
+
+    Raising the limit wakes queued waiters immediately; lowering it lets
+    running holders finish and only delays new acquisitions. Slots are
+    handed to waiters in FIFO order, so a new caller cannot take the slot
+    freed for a queued one.
+    """
+
+    def __init__(self, limit: int = 1) -> None:
+        self._limit = max(1, int(limit))
+        self._active = 0
+        self._waiters = collections.deque()
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    def set_limit(self, limit: int) -> None:
+        self._limit = max(1, int(limit))
+        self._wake()
+
+    def _wake(self) -> None:
+        # the slot is taken on the waiter's behalf before it resumes
+        while self._active < self._limit and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._active += 1
+                waiter.set_result(None)
+
+    async def __aenter__(self):
+        if self._active < self._limit and not self._waiters:
+            self._active += 1
+            return self
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # a slot was handed to us; pass it on to the next waiter
+                self._active -= 1
+                self._wake()
+            else:
+                self._waiters.remove(waiter)
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._active -= 1
+        self._wake()
+        return False
+
 
 class BackupManager:
     def __init__(self, hass) -> None:
         self.hass = hass
         self.device_handlers = []
+        self.options = dict(DEFAULT_OPTIONS)
+        # limits how many devices are backed up at the same time
+        self._slots = ConcurrencyLimit(self.options[CONF_MAX_CONCURRENCY])
+        # per-device backup health pushed to the sensor entities
+        self.health = BackupHealth(hass, self.options[CONF_STALE_DAYS])
+        self._unsub_schedule = None
+        # download rate limits shared by all handlers
+        self.bandwidth = BandwidthLimiter()
+        # per-device locks and the queued (not yet started) run per device
+        self._device_locks = {}
+        self._pending = {}
+        # DeviceRegistryDiscovery, set up by the integration
+        self.discovery = None
+        # ArtifactEncryption shared by all handlers; None writes plaintext
+        self.encryption = None
+        # passphrase from the YAML configuration (the options' one wins) and
+        # the one `encryption` was derived from
+        self.configured_encryption_key = None
+        self._passphrase = None
+        # RunReport of the last finished run
+        self.last_report = None
+        # removes the integration's homeassistant_stop listener
+        self.unsub_stop = None
+        # per handler type (see handler_type) timeouts layered over the
+        # options: from YAML, then from the options' `timeouts`
+        self.handler_timeouts = {}
+        self._option_timeouts = {}
+        # set by shutdown(); no new backups are started afterwards
+        self._stopping = False
+        # backup tasks in flight, drained on shutdown
+        self._tasks = set()
+        # device keys of started runs that have not finished yet, and the
+        # ones left unfinished by the previous shutdown
+        self._unfinished = set()
+        self.resume_first = set()
+        self._checkpoint = (
+            Store(hass, CHECKPOINT_STORAGE_VERSION, CHECKPOINT_STORAGE_KEY)
+            if hass is not None and Store is not None
+            else None
+        )
+        self._encryption_store = (
+            Store(hass, ENCRYPTION_STORAGE_VERSION, ENCRYPTION_STORAGE_KEY)
+            if hass is not None and Store is not None
+            else None
+        )
+
+    async def async_load(self) -> None:
+        """Restore the health records and the shutdown checkpoint."""
+        await self.health.async_load()
+        if self._checkpoint is None:
+            return
+        data = await self._checkpoint.async_load() or {}
+        self.resume_first = set(data.get("unfinished", []))
+        if self.resume_first:
+            _LOGGER.info(
+                "%d device backups were interrupted by the last shutdown; "
+                "they run first next time",
+                len(self.resume_first),
+            )
+
+    async def async_set_encryption_key(self, passphrase: str | None) -> None:
+        """Enable artifact encryption with `passphrase` (None disables it).
+
+        The key derivation (scrypt) is CPU-bound and runs in the executor.
+        Its salt is created once per installation and kept in storage.
+        """
+        if not passphrase:
+            encryption = None
+        else:
+            salt = await self._encryption_salt()
+            if self.hass is not None:
+                encryption = await self.hass.async_add_executor_job(
+                    ArtifactEncryption.from_passphrase, passphrase, salt)
+            else:
+                encryption = ArtifactEncryption.from_passphrase(passphrase, salt)
+        self.encryption = encryption
+        self._passphrase = passphrase or None
+        for handler in self.device_handlers:
+            handler.encryption = self.encryption
 
-    def register_handler(self, handler) -> None:
+    async def async_update_encryption(self) -> None:
+        """Derive the key again if the passphrase in effect has changed.
+
+        A passphrase set in the options takes precedence over the YAML one.
+        """
+        passphrase = self.options[CONF_ENCRYPTION_KEY] or self.configured_encryption_key
+        if (passphrase or None) == self._passphrase:
+            return
+        try:
+            await self.async_set_encryption_key(passphrase)
+        except Exception:
+            _LOGGER.exception("Could not enable backup encryption")
+
+    async def _encryption_salt(self) -> bytes | None:
+        """Return the stored key salt, creating it on first use."""
+        if self._encryption_store is None:
+            return None
+        data = await self._encryption_store.async_load() or {}
+        try:
+            salt = bytes.fromhex(data["salt"])
+        except (KeyError, TypeError, ValueError):
+            salt = b""
+        if len(salt) != SALT_SIZE:
+            salt = os.urandom(SALT_SIZE)
+            await self._encryption_store.async_save({"salt": salt.hex()})
+        return salt
+
+    @staticmethod
+    def handler_type(handler) -> str:
+        """Return the short type name used in settings, e.g. "wled" or "shelly"."""
+        return handler_type(type(handler))
+
+    @staticmethod
+    def _parse_handler_timeouts(timeouts) -> dict:
+        parsed = {}
+        for name, value in (timeouts or {}).items():
+            value = parse_timeouts(value)
+            if value:
+                parsed[str(name).lower()] = value
+        return parsed
+
+    def set_handler_timeouts(self, timeouts) -> None:
+        """Set connect/read/total timeouts per handler type.
+
+        `timeouts` maps a handler type ("wled", "tasmota", "shelly",
+        "esphome", "genericdownload") to a number of seconds or an object
+        with `connect`, `read` and `total`; they override the timeouts
+        from the options for that type. The options' own `timeouts` are
+        applied on top.
+        """
+        self.handler_timeouts = self._parse_handler_timeouts(timeouts)
+        for handler in self.device_handlers:
+            self._configure_handler(handler)
+
+    @staticmethod
+    def handler_key(handler):
+        """Return the key identifying the device a handler backs up."""
+        return (type(handler).__name__, getattr(handler, "device_id", None))
+
+    def register_handler(self, handler) -> bool:
+        """Register a handler; return False if its device is already known."""
+        key = self.handler_key(handler)
+        if any(self.handler_key(h) == key for h in self.device_handlers):
+            _LOGGER.debug(
+                "Handler for %s already registered",
+                getattr(handler, "device_name", "<unknown>"),
+            )
+            return False
+        self._configure_handler(handler)
         self.device_handlers.append(handler)
+        self.health.add_device(
+            device_key(handler), getattr(handler, "device_name", "<unknown>"))
+        return True
 
-    async def run_backups(self) -> None:
+    def _configure_handler(self, handler) -> None:
+        """Apply the shared limiter, encryption and current options to a handler."""
+        handler.bandwidth = self.bandwidth
+        handler.encryption = self.encryption
+        handler.probe_timeout = self.options[CONF_PROBE_TIMEOUT]
+        if getattr(handler, "timeouts", None) is not None:
+            handler.timeouts.update(
+                connect=self.options[CONF_CONNECT_TIMEOUT],
+                read=self.options[CONF_READ_TIMEOUT],
+                total=self.options[CONF_TOTAL_TIMEOUT],
+            )
+            name = self.handler_type(handler)
+            handler.timeouts.update(self.handler_timeouts.get(name, {}))
+            handler.timeouts.update(self._option_timeouts.get(name, {}))
+
+    def apply_options(self, options=None) -> None:
+        """Apply config entry options to the running manager.
+
+        Takes effect immediately without a reload: handlers get the new
+        timeouts for their next request, the concurrency limit changes for
+        devices not yet started and the schedule is replaced. A run in
+        progress keeps going. A changed encryption key is applied by
+        `async_update_encryption`.
+        """
+        self.options = {**DEFAULT_OPTIONS, **(options or {})}
+        self._option_timeouts = self._parse_handler_timeouts(self.options[CONF_TIMEOUTS])
+        self._slots.set_limit(self.options[CONF_MAX_CONCURRENCY])
+        rate = float(self.options[CONF_BANDWIDTH_LIMIT] or 0) * 1024
+        self.bandwidth.set_rate(rate or None)
+        for handler in self.device_handlers:
+            self._configure_handler(handler)
+        self._schedule(float(self.options[CONF_SCHEDULE_HOURS] or 0))
+        self.health.set_stale_days(float(self.options[CONF_STALE_DAYS]))
+
+    def _schedule(self, hours: float) -> None:
+        if self._unsub_schedule is not None:
+            self._unsub_schedule()
+            self._unsub_schedule = None
+        if hours <= 0 or self.hass is None or async_track_time_interval is None:
+            return
+
+        async def _scheduled_run(now) -> None:
+            _LOGGER.info("Starting scheduled backup run")
+            await self.run_backups()
+
+        self._unsub_schedule = async_track_time_interval(
+            self.hass, _scheduled_run, timedelta(hours=hours)
+        )
+
+    def unregister_handler(self, handler) -> None:
+        """Remove a handler; a run in progress for it is not interrupted."""
+        if handler in self.device_handlers:
+            self.device_handlers.remove(handler)
+            self.health.remove_device(device_key(handler))
+
+    async def run_backups(self, profile: bool = False) -> None:
         """Run backups for all registered handlers.
 
         This calls each handler's `run_backup()` helper which sets up the
         backup folder and then invokes the implementation-specific
-        `fetch_backup(folder)` method.
+        `fetch_backup(folder)` method. With `profile=True` the run is
+        profiled and the stats are written next to the backups.
+
+        Every run writes a RunReport (see report.py) to the reports folder
+        and fires EVENT_RUN_FINISHED with its summary.
         """
-        for handler in self.device_handlers:
+        if self._stopping:
+            _LOGGER.debug("Not starting a backup run during shutdown")
+            return
+        if not profile:
+            await self._run_backups()
+            return
+
+        profiler = RunProfiler(self.hass)
+        if not profiler.start():
+            await self._run_backups()
+            return
+        try:
+            await self._run_backups()
+        finally:
+            await profiler.stop()
+
+    async def _run_backups(self) -> None:
+        # Devices interrupted by the last shutdown go first; the slots are
+        # handed out in the order the handlers are queued.
+        handlers = sorted(
+            self.device_handlers, key=lambda h: device_key(h) not in self.resume_first
+        )
+        self._unfinished.update(device_key(h) for h in handlers)
+        report = RunReport()
+        await asyncio.gather(
+            *(self._run_handler(handler, report) for handler in handlers))
+        report.finish()
+        self.last_report = report
+        await self._publish_report(report)
+        if self._stopping:
+            return
+        retention_days = float(self.options[CONF_RETENTION_DAYS] or 0)
+        if retention_days > 0 and self.hass is not None:
             try:
-                ok = await handler.run_backup()
+                # devices still in the registry keep their folders, even
+                # when disabled or currently without a handler
+                known = (
+                    self.discovery.known_device_ids()
+                    if self.discovery is not None
+                    else set()
+                )
+                await self.hass.async_add_executor_job(self._prune, retention_days, known)
+            except Exception:
+                _LOGGER.exception("Failed to prune old backups")
+
+    async def plan_backups(self) -> dict:
+        """Report what a run would transfer without writing anything.
+
+        Runs the online checks and probes every planned URL (HEAD or a
+        one-byte range request). The duration estimate adds the measured
+        probe latency per request to the transfer time at the configured
+        bandwidth limits (or PLAN_ASSUMED_RATE for unthrottled hosts),
+        spread over the configured concurrency.
+        """
+        plans = await asyncio.gather(
+            *(self._plan_handler(handler) for handler in list(self.device_handlers))
+        )
+
+        for plan in plans:
+            requests = plan.get("requests", [])
+            plan["bytes"] = sum(r["bytes"] or 0 for r in requests)
+            plan["unknown_size"] = sum(1 for r in requests if r["bytes"] is None)
+            plan["estimated_duration"] = round(
+                sum(
+                    r.get("latency", 0)
+                    + (r["bytes"] or 0)
+                    / (self.bandwidth.rate_for(host_key(r["url"])) or PLAN_ASSUMED_RATE)
+                    for r in requests
+                ),
+                1,
+            )
+
+        total_bytes = sum(p["bytes"] for p in plans)
+        durations = [p["estimated_duration"] for p in plans]
+        estimates = [sum(durations) / self._slots.limit, *durations]
+        if self.bandwidth.global_rate:
+            # concurrent devices share the global limit
+            estimates.append(total_bytes / self.bandwidth.global_rate)
+        estimate = max(estimates)
+        report = {
+            "device_count": len(plans),
+            "online": sum(1 for p in plans if p.get("online")),
+            "requests": sum(len(p.get("requests", [])) for p in plans),
+            "bytes": total_bytes,
+            "unknown_size": sum(p["unknown_size"] for p in plans),
+            "estimated_duration": round(estimate, 1),
+            "assumed_rate": PLAN_ASSUMED_RATE,
+            "devices": plans,
+        }
+        _LOGGER.info(
+            "Backup plan: %d/%d devices online, %d requests, %d bytes "
+            "(%d of unknown size), about %.1f s",
+            report["online"],
+            report["device_count"],
+            report["requests"],
+            report["bytes"],
+            report["unknown_size"],
+            report["estimated_duration"],
+        )
+        return report
+
+    async def _plan_handler(self, handler) -> dict:
+        async with self._slots:
+            try:
+                return await handler.plan_backup()
+            except Exception as exc:
+                _LOGGER.exception(
+                    "Exception while planning backup for %s",
+                    getattr(handler, "device_name", "<unknown>"),
+                )
+                return {
+                    "device": getattr(handler, "device_name", "<unknown>"),
+                    "handler": type(handler).__name__,
+                    "online": False,
+                    "requests": [],
+                    "error": str(exc),
+                }
+
+    async def _run_handler(self, handler, report=None) -> None:
+        name = getattr(handler, "device_name", "<unknown>")
+        async with self._slots:
+            started = dt_util.utcnow()
+            begin = time.monotonic()
+            if self._stopping:
+                if report is not None:
+                    report.add_device(handler, "skipped", None, 0)
+                return
+            ok = False
+            error = None
+            try:
+                ok = await self.backup_handler(handler)
                 if ok:
-                    _LOGGER.info(
-                        "Backup successful for %s",
-                        getattr(handler, "device_name", "<unknown>"),
-                    )
+                    _LOGGER.info("Backup successful for %s", name)
                 else:
-                    _LOGGER.warning(
-                        "Backup failed for %s",
-                        getattr(handler, "device_name", "<unknown>"),
-                    )
+                    _LOGGER.warning("Backup failed for %s", name)
+                    error = getattr(handler, "last_error", None)
+                status = "ok" if ok else getattr(handler, "last_status", None) or "failed"
+            except asyncio.CancelledError as exc:
+                if not self._stopping or asyncio.current_task().cancelling():
+                    raise
+                # stays unfinished and goes into the checkpoint
+                _LOGGER.warning("Backup of %s interrupted by shutdown", name)
+                if report is not None:
+                    report.add_device(
+                        handler, "interrupted", started, time.monotonic() - begin, exc)
+                return
             except Exception as exc:  # pragma: no cover - defensive
-                _LOGGER.exception(
-                    "Exception during backup for %s: %s",
-                    getattr(handler, "device_name", "<unknown>"),
-                    exc,
+                _LOGGER.exception("Exception during backup for %s: %s", name, exc)
+                status, error = "failed", exc
+            self.health.record_result(device_key(handler), ok)
+            if report is not None:
+                report.add_device(handler, status, started, time.monotonic() - begin, error)
+
+    async def _publish_report(self, report) -> None:
+        """Write the run report, fire EVENT_RUN_FINISHED and log a summary."""
+        path = None
+        if self.hass is not None:
+            try:
+                path = await self.hass.async_add_executor_job(
+                    report.write,
+                    self.hass.config.path(REPORTS_FOLDER),
+                    bool(self.options[CONF_REPORT_CSV]),
+                )
+            except Exception:
+                _LOGGER.exception("Failed to write the backup run report")
+        data = report.event_data(path)
+        _LOGGER.info("Backup run finished: %s", summary_message(data))
+        if self.hass is not None:
+            self.hass.bus.async_fire(EVENT_RUN_FINISHED, data)
+
+    def _prune(self, retention_days: float, known=()) -> None:
+        """Remove profiles, reports and orphaned device folders older than the retention.
+
+        A device folder is orphaned when no registered handler writes to
+        it any more and its device id is not in `known` (the devices still
+        in the device registry), i.e. the device was removed from Home
+        Assistant. Runs in the executor.
+        """
+        cutoff = time.time() - retention_days * 86400
+        root = self.hass.config.path(BACKUPS_FOLDER)
+
+        profiles = self.hass.config.path(PROFILES_FOLDER)
+        reports = self.hass.config.path(REPORTS_FOLDER)
+        for folder in (profiles, reports):
+            if not os.path.isdir(folder):
+                continue
+            for name in os.listdir(folder):
+                path = os.path.join(folder, name)
+                if os.path.isfile(path) and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+
+        active = {
+            os.path.normpath(h.resolve_backup_folder())
+            for h in self.device_handlers
+            if hasattr(h, "resolve_backup_folder")
+        }
+        for name in os.listdir(root) if os.path.isdir(root) else []:
+            device_dir = os.path.join(root, name)
+            if device_dir in (profiles, reports) or not os.path.isdir(device_dir):
+                continue
+            for device_id in os.listdir(device_dir):
+                folder = os.path.normpath(os.path.join(device_dir, device_id))
+                if folder in active or device_id in known or not os.path.isdir(folder):
+                    continue
+                newest = max(
+                    (
+                        os.path.getmtime(os.path.join(dirpath, f))
+                        for dirpath, _, files in os.walk(folder)
+                        for f in files
+                    ),
+                    default=os.path.getmtime(folder),
                 )
+                if newest < cutoff:
+                    _LOGGER.info("Removing backups of orphaned device %s", folder)
+                    shutil.rmtree(folder, ignore_errors=True)
+            if not os.listdir(device_dir):
+                os.rmdir(device_dir)
+
+    async def backup_handler(self, handler) -> bool:
+        """Back up a single handler, serialized per device.
 
-    async def shutdown(self) -> None:
+        A trigger for a device whose backup is running is queued behind
+        it; further triggers arriving while that run is still queued are
+        coalesced into it and share its result.
+        """
+        if self._stopping:
+            raise asyncio.CancelledError
+        key = self.handler_key(handler)
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._locked_backup(key, handler))
+            self._pending[key] = task
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            _LOGGER.debug(
+                "Coalescing backup trigger for %s",
+                getattr(handler, "device_name", "<unknown>"),
+            )
+        # shield so a cancelled caller does not abort a run others wait for
+        return await asyncio.shield(task)
+
+    async def _locked_backup(self, key, handler) -> bool:
+        task = asyncio.current_task()
+        lock = self._device_locks.setdefault(key, asyncio.Lock())
+        try:
+            async with lock:
+                # Running now: new triggers should queue a fresh run
+                if self._pending.get(key) is task:
+                    del self._pending[key]
+                if self._stopping:
+                    # queued behind a run that was drained on shutdown
+                    raise asyncio.CancelledError
+                ok = await handler.run_backup()
+            self._unfinished.discard(device_key(handler))
+            self.resume_first.discard(device_key(handler))
+            return ok
+        finally:
+            if self._pending.get(key) is task:
+                del self._pending[key]
+
+    async def shutdown(self, timeout: float = SHUTDOWN_TIMEOUT) -> None:
         """Shutdown the manager and its handlers.
 
+        No new backups start once this is called. Backups in flight get
+        `timeout` seconds to finish; the rest are cancelled, which removes
+        their partially written temp files. Devices whose backup did not
+        finish are saved to a checkpoint so the next run starts with them.
+
         If handlers implement an async `shutdown()` method it will be
         awaited; if they implement a synchronous `shutdown()` it will
         be called in the executor. Finally the handler list is cleared.
         """
+        if self._stopping:
+            return
+        self._stopping = True
+        self._schedule(0)
+        self.health.async_stop()
+        if self.discovery is not None:
+            self.discovery.async_stop()
+            self.discovery = None
+
+        running = [task for task in self._tasks if not task.done()]
+        if running:
+            _LOGGER.info(
+                "Waiting up to %s s for %d running backups", timeout, len(running))
+            _, pending = await asyncio.wait(running, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                _LOGGER.warning("Cancelled %d unfinished backups", len(pending))
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        await self._save_checkpoint()
+
         for handler in list(self.device_handlers):
             try:
                 # prefer async shutdown
@@ -66,3 +650,18 @@ class BackupManager:
 
         # remove handlers list
         self.device_handlers.clear()
+
+    def checkpoint(self) -> list:
+        """Return the device keys a restart should back up first."""
+        return sorted(self._unfinished | self.resume_first)
+
+    async def _save_checkpoint(self) -> None:
+        if self._checkpoint is None:
+            return
+        unfinished = self.checkpoint()
+        if unfinished:
+            _LOGGER.info("Saving %d unfinished device backups for the next run", len(unfinished))
+        try:
+            await self._checkpoint.async_save({"unfinished": unfinished})
+        except Exception:
+            _LOGGER.exception("Could not save the backup checkpoint")
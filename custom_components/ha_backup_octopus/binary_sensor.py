@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from homeassistant.components.binary_sensor import (
+    BinarySensorDeviceClass,
+    BinarySensorEntity,
+)
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.util import slugify
+
+from . import DOMAIN
+from .health import FRESH
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_setup_platform(hass: HomeAssistant, config, async_add_entities: AddEntitiesCallback, discovery_info=None):
+    """Set up one staleness binary sensor per backed-up device.
+
+    Devices registered later (e.g. found through the device registry) get
+    their sensor when the health tracker reports them.
+    """
+    manager = hass.data.get(DOMAIN)
+    if manager is None:
+        return
+
+    health = manager.health
+    # A device that is removed and added again (e.g. disabled and
+    # re-enabled) keeps its entity, which becomes available again.
+    known = set(health.categories)
+    async_add_entities([BackupStaleBinarySensor(health, key) for key in known])
+
+    @callback
+    def _new_device(key: str) -> None:
+        if key in known:
+            return
+        known.add(key)
+        async_add_entities([BackupStaleBinarySensor(health, key)])
+
+    # Lives as long as the manager; both go away when the integration unloads
+    health.async_add_device_listener(_new_device)
+
+
+class BackupStaleBinarySensor(BinarySensorEntity):
+    """On when a device has no recent successful backup (or the last one failed)."""
+
+    _attr_device_class = BinarySensorDeviceClass.PROBLEM
+    _attr_should_poll = False
+
+    def __init__(self, health, key: str) -> None:
+        self._health = health
+        self._key = key
+        name = health.records[key]["name"]
+        self._attr_name = f"HA Backup Octopus: {name} backup stale"
+        self._attr_unique_id = f"ha_backup_octopus_stale_{slugify(key)}"
+        self._attr_icon = "mdi:backup-restore"
+
+    async def async_added_to_hass(self) -> None:
+        @callback
+        def _changed(key: str) -> None:
+            self.async_write_ha_state()
+
+        self.async_on_remove(self._health.async_add_listener(_changed, self._key))
+
+    @property
+    def available(self) -> bool:
+        return self._key in self._health.categories
+
+    @property
+    def is_on(self) -> bool:
+        return self._health.categories.get(self._key) != FRESH
+
+    @property
+    def extra_state_attributes(self) -> dict:
+        record = self._health.records.get(self._key, {})
+        return {
+            "category": self._health.categories.get(self._key),
+            "last_success": record.get("last_success"),
+            "last_attempt": record.get("last_attempt"),
+            "last_attempt_ok": record.get("last_ok"),
+        }
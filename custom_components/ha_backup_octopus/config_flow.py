@@ -2,9 +2,29 @@ from __future__ import annotations
 
 from typing import Any
 
+import voluptuous as vol
+
 from homeassistant import config_entries
+from homeassistant.core import callback
+from homeassistant.helpers import selector
 
 from . import DOMAIN
+from .const import (
+    CONF_BANDWIDTH_LIMIT,
+    CONF_CONNECT_TIMEOUT,
+    CONF_ENCRYPTION_KEY,
+    CONF_MAX_CONCURRENCY,
+    CONF_PROBE_TIMEOUT,
+    CONF_READ_TIMEOUT,
+    CONF_REPORT_CSV,
+    CONF_RETENTION_DAYS,
+    CONF_SCHEDULE_HOURS,
+    CONF_STALE_DAYS,
+    CONF_TIMEOUTS,
+    CONF_TOTAL_TIMEOUT,
+    DEFAULT_OPTIONS,
+)
+from .handlers import TIMEOUTS_SCHEMA
 
 
 class HaBackupOctopusConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
@@ -12,6 +32,7 @@ class HaBackupOctopusConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     This is intentionally minimal: it only creates an empty config entry so
     the integration is loaded and can discover handlers (WLED config entries).
+    Tuning happens in the options flow.
     """
 
     VERSION = 1
@@ -22,3 +43,66 @@ class HaBackupOctopusConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
         # No configuration required; create an empty entry so async_setup runs.
         return self.async_create_entry(title="HA Backup Octopus", data={})
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        return HaBackupOctopusOptionsFlow()
+
+
+def _seconds(minimum: float = 0.5):
+    return vol.All(vol.Coerce(float), vol.Range(min=minimum, max=86400))
+
+
+OPTIONS_VALIDATORS = {
+    CONF_MAX_CONCURRENCY: vol.All(vol.Coerce(int), vol.Range(min=1, max=32)),
+    CONF_PROBE_TIMEOUT: _seconds(),
+    CONF_CONNECT_TIMEOUT: _seconds(),
+    CONF_READ_TIMEOUT: _seconds(),
+    CONF_TOTAL_TIMEOUT: _seconds(),
+    CONF_BANDWIDTH_LIMIT: vol.All(vol.Coerce(int), vol.Range(min=0)),
+    CONF_SCHEDULE_HOURS: vol.All(vol.Coerce(float), vol.Range(min=0, max=24 * 365)),
+    CONF_RETENTION_DAYS: vol.All(vol.Coerce(int), vol.Range(min=0)),
+    CONF_STALE_DAYS: vol.All(vol.Coerce(float), vol.Range(min=0.1)),
+    CONF_REPORT_CSV: bool,
+    CONF_ENCRYPTION_KEY: selector.TextSelector(
+        selector.TextSelectorConfig(type=selector.TextSelectorType.PASSWORD)
+    ),
+    # handler type -> seconds, edited as YAML; checked with TIMEOUTS_SCHEMA
+    CONF_TIMEOUTS: selector.ObjectSelector(),
+}
+
+# Options that may be left empty; the form suggests their current value
+# instead of defaulting to it, so clearing them sticks
+OPTIONAL_OPTIONS = (CONF_ENCRYPTION_KEY, CONF_TIMEOUTS)
+
+
+class HaBackupOctopusOptionsFlow(config_entries.OptionsFlow):
+    """Edit concurrency, timeouts, bandwidth, schedule, retention, reports and encryption.
+
+    Saved options are applied to the running BackupManager by the entry's
+    update listener; no reload is needed.
+    """
+
+    async def async_step_init(self, user_input: dict[str, Any] | None = None):
+        errors = {}
+        if user_input is not None:
+            try:
+                user_input[CONF_TIMEOUTS] = TIMEOUTS_SCHEMA(user_input.get(CONF_TIMEOUTS) or {})
+            except vol.Invalid:
+                errors[CONF_TIMEOUTS] = "invalid_timeouts"
+            else:
+                return self.async_create_entry(title="", data=user_input)
+
+        current = {**DEFAULT_OPTIONS, **self.config_entry.options, **(user_input or {})}
+        schema = vol.Schema(
+            {
+                (
+                    vol.Optional(key, description={"suggested_value": current[key]})
+                    if key in OPTIONAL_OPTIONS
+                    else vol.Required(key, default=current[key])
+                ): validator
+                for key, validator in OPTIONS_VALIDATORS.items()
+            }
+        )
+        return self.async_show_form(step_id="init", data_schema=schema, errors=errors)
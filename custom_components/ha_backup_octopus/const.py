@@ -0,0 +1,41 @@
+"""Option keys and defaults for HA Backup Octopus."""
+
+BACKUPS_FOLDER = "ha_backup_octopus_backups"
+
+CONF_MAX_CONCURRENCY = "max_concurrency"
+CONF_PROBE_TIMEOUT = "probe_timeout"
+CONF_CONNECT_TIMEOUT = "connect_timeout"
+CONF_READ_TIMEOUT = "read_timeout"
+CONF_TOTAL_TIMEOUT = "total_timeout"
+CONF_BANDWIDTH_LIMIT = "bandwidth_limit"
+CONF_SCHEDULE_HOURS = "schedule_hours"
+CONF_RETENTION_DAYS = "retention_days"
+CONF_STALE_DAYS = "stale_days"
+CONF_REPORT_CSV = "report_csv"
+CONF_ENCRYPTION_KEY = "encryption_key"
+CONF_TIMEOUTS = "timeouts"
+
+DEFAULT_OPTIONS = {
+    # devices backed up at the same time
+    CONF_MAX_CONCURRENCY: 1,
+    # seconds
+    CONF_PROBE_TIMEOUT: 3.0,
+    CONF_CONNECT_TIMEOUT: 10.0,
+    CONF_READ_TIMEOUT: 60.0,
+    CONF_TOTAL_TIMEOUT: 600.0,
+    # kB/s across all downloads, 0 = unlimited
+    CONF_BANDWIDTH_LIMIT: 0,
+    # hours between scheduled runs, 0 = no schedule
+    CONF_SCHEDULE_HOURS: 0,
+    # days to keep profiles, run reports and folders of devices removed from
+    # Home Assistant, 0 = keep forever
+    CONF_RETENTION_DAYS: 0,
+    # days without a successful backup before a device counts as stale
+    CONF_STALE_DAYS: 7,
+    # also write each run report as CSV next to the JSON
+    CONF_REPORT_CSV: False,
+    # passphrase for encrypting collected files, "" = use the YAML one or none
+    CONF_ENCRYPTION_KEY: "",
+    # per handler type timeouts layered over the YAML ones, e.g. {"shelly": 30}
+    CONF_TIMEOUTS: {},
+}
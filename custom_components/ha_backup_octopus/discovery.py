@@ -0,0 +1,183 @@
+"""Discover backupable devices from Home Assistant's device registry.
+
+Complements the config-entry discovery in `async_setup`: handler classes
+declare `device_matchers()` and any registry device matching one of them
+gets handlers, even when no config entry of the handler's domain exists.
+Devices that do have such an entry get their handlers from the entry, so
+entries added after startup are picked up as well.
+"""
+import logging
+
+from homeassistant.core import callback
+from homeassistant.helpers import device_registry as dr
+
+_LOGGER = logging.getLogger(__name__)
+
+# Order in which matcher fields are used as the index key
+MATCH_FIELDS = (
+    "entry_domain",
+    "manufacturer",
+    "model",
+    "identifier_domain",
+    "connection_type",
+)
+
+
+def _device_values(device, entry_domains) -> dict[str, set[str]]:
+    """Return the lower-cased values of `device` for every match field."""
+    return {
+        "entry_domain": set(entry_domains),
+        "manufacturer": {(device.manufacturer or "").lower()},
+        "model": {(device.model or "").lower()},
+        "identifier_domain": {domain.lower() for domain, _ in device.identifiers},
+        "connection_type": {ctype.lower() for ctype, _ in device.connections},
+    }
+
+
+class DeviceRegistryDiscovery:
+    """Keep the manager's handlers in sync with matching registry devices.
+
+    Matchers of all handler classes are indexed by their first field, so a
+    device is checked with a handful of dict lookups instead of testing
+    every matcher. The registry is scanned once on start; afterwards only
+    the devices named in `device_registry_updated` events are evaluated.
+    """
+
+    def __init__(self, hass, manager, handler_classes) -> None:
+        self.hass = hass
+        self.manager = manager
+        # (field, value) -> [(handler class, normalized matcher)]
+        self._index = {}
+        # device id -> handlers registered for it
+        self._handlers = {}
+        self._unsub = None
+
+        for handler_cls in handler_classes:
+            for matcher in handler_cls.device_matchers():
+                matcher = {
+                    field: str(matcher[field]).lower()
+                    for field in MATCH_FIELDS
+                    if matcher.get(field)
+                }
+                if not matcher:
+                    continue
+                key = next((f, matcher[f]) for f in MATCH_FIELDS if f in matcher)
+                self._index.setdefault(key, []).append((handler_cls, matcher))
+
+    def _matching_classes(self, device, entry_domains=()) -> list:
+        values = _device_values(device, entry_domains)
+        classes = []
+        for field, field_values in values.items():
+            for value in field_values:
+                for handler_cls, matcher in self._index.get((field, value), ()):
+                    if handler_cls in classes:
+                        continue
+                    if all(v in values[f] for f, v in matcher.items()):
+                        classes.append(handler_cls)
+        return classes
+
+    def _entries(self, device) -> list:
+        entries = []
+        for entry_id in device.config_entries or ():
+            entry = self.hass.config_entries.async_get_entry(entry_id)
+            if entry is not None:
+                entries.append(entry)
+        return entries
+
+    def _create_handlers(self, device, include_disabled=False) -> list:
+        if device.disabled and not include_disabled:
+            return []
+        handlers = []
+        entries = self._entries(device)
+        entry_domains = {entry.domain for entry in entries}
+        for handler_cls in self._matching_classes(device, entry_domains):
+            domain = handler_cls.config_entry_domain()
+            try:
+                if domain in entry_domains:
+                    # Build from the entry, like config-entry discovery does
+                    for entry in entries:
+                        if entry.domain == domain:
+                            handlers.extend(
+                                handler_cls.create_handlers_from_entry(self.hass, entry))
+                else:
+                    handlers.extend(
+                        handler_cls.create_handlers_from_device(self.hass, device))
+            except Exception:
+                _LOGGER.exception(
+                    "Failed to create handler(s) from device %s for %s",
+                    device.id,
+                    handler_cls,
+                )
+        return handlers
+
+    @callback
+    def known_device_ids(self) -> set[str]:
+        """Return the handler device ids of all registry devices.
+
+        Disabled devices are included, so pruning keeps their folders.
+        """
+        device_ids = set()
+        for device in list(dr.async_get(self.hass).devices.values()):
+            for handler in self._create_handlers(device, include_disabled=True):
+                device_ids.add(handler.device_id)
+        return device_ids
+
+    def _remove_device(self, device_id) -> None:
+        for handler in self._handlers.pop(device_id, []):
+            self.manager.unregister_handler(handler)
+
+    @callback
+    def _evaluate(self, device_id) -> None:
+        device = dr.async_get(self.hass).async_get(device_id)
+        new = self._create_handlers(device) if device is not None else []
+        old = self._handlers.get(device_id, [])
+
+        # Leave handlers registered elsewhere (config-entry discovery at
+        # startup) to their owner
+        own = {self.manager.handler_key(h) for h in old}
+        taken = {self.manager.handler_key(h) for h in self.manager.device_handlers}
+        new = [
+            h for h in new
+            if self.manager.handler_key(h) in own
+            or self.manager.handler_key(h) not in taken
+        ]
+
+        keys = [self.manager.handler_key(h) for h in new]
+        if keys == [self.manager.handler_key(h) for h in old]:
+            return
+
+        self._remove_device(device_id)
+        registered = [h for h in new if self.manager.register_handler(h)]
+        if registered:
+            _LOGGER.info(
+                "Discovered %d backup handler(s) for device %s",
+                len(registered),
+                device.name_by_user or device.name or device_id,
+            )
+            self._handlers[device_id] = registered
+
+    @callback
+    def _handle_registry_updated(self, event) -> None:
+        device_id = event.data.get("device_id")
+        if event.data.get("action") == "remove":
+            self._remove_device(device_id)
+        else:
+            self._evaluate(device_id)
+
+    @callback
+    def async_start(self) -> None:
+        """Scan the registry once and subscribe to registry updates."""
+        if not self._index:
+            return
+        for device_id in list(dr.async_get(self.hass).devices):
+            self._evaluate(device_id)
+        self._unsub = self.hass.bus.async_listen(
+            dr.EVENT_DEVICE_REGISTRY_UPDATED, self._handle_registry_updated
+        )
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop listening for registry updates."""
+        if self._unsub is not None:
+            self._unsub()
+            self._unsub = None
@@ -3,7 +3,39 @@
 Expose AVAILABLE_HANDLERS so the integration can discover handler classes
 without knowing implementation details.
 """
+import voluptuous as vol
+
+from .base import DEFAULT_TIMEOUTS
 from .wled import WLEDBackupHandler
+from .tasmota import TasmotaBackupHandler
+from .shelly import ShellyBackupHandler
+from .esphome import ESPHomeBackupHandler
 from .generic_download import GenericDownloadBackupHandler
 
-AVAILABLE_HANDLERS = [WLEDBackupHandler, GenericDownloadBackupHandler]
+AVAILABLE_HANDLERS = [
+    WLEDBackupHandler,
+    TasmotaBackupHandler,
+    ShellyBackupHandler,
+    ESPHomeBackupHandler,
+    GenericDownloadBackupHandler,
+]
+
+
+def handler_type(handler_cls) -> str:
+    """Return the short type name used in settings, e.g. "wled" or "shelly"."""
+    return handler_cls.__name__.removesuffix("BackupHandler").lower()
+
+
+HANDLER_TYPES = [handler_type(handler_cls) for handler_cls in AVAILABLE_HANDLERS]
+
+_SECONDS = vol.All(vol.Coerce(float), vol.Range(min=0, min_included=False))
+
+# `timeouts` setting: handler type -> seconds for the whole request or an
+# object with connect/read/total seconds
+TIMEOUTS_SCHEMA = vol.Schema(
+    {
+        vol.All(str, vol.Lower, vol.In(HANDLER_TYPES)): vol.Any(
+            _SECONDS, {vol.Optional(key): _SECONDS for key in DEFAULT_TIMEOUTS}
+        )
+    }
+)
@@ -0,0 +1,109 @@
+"""Token-bucket bandwidth limiting for backup downloads.
+
+A single `BandwidthLimiter` is shared by all handlers of a BackupManager.
+It holds an optional global bucket plus optional per-host buckets; a
+download chunk has to pass every bucket that applies to its host.
+Rates are in bytes per second, a rate of None or 0 means unlimited.
+"""
+import asyncio
+import logging
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Async token bucket allowing bursts of up to one second of traffic."""
+
+    def __init__(self, rate: float) -> None:
+        self.rate = float(rate)
+        self._tokens = self.rate
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def consume(self, amount: int) -> None:
+        """Take `amount` tokens, sleeping until the bucket can pay for them.
+
+        Chunks larger than the bucket are allowed; the bucket goes into
+        debt and the caller waits until it is paid back.
+        """
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.rate, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            if self._tokens < 0:
+                await asyncio.sleep(-self._tokens / self.rate)
+
+
+class BandwidthLimiter:
+    """Global and per-host download rate limits."""
+
+    def __init__(self, rate: float | None = None, host_rates=None) -> None:
+        self._global = None
+        # source -> global rate; the lowest one applies
+        self._global_rates = {}
+        self._hosts = {}
+        self.set_rate(rate)
+        for host, host_rate in (host_rates or {}).items():
+            self.set_host_rate(host, host_rate)
+
+    @staticmethod
+    def _bucket(rate):
+        try:
+            rate = float(rate) if rate else 0
+        except (TypeError, ValueError):
+            _LOGGER.warning("Ignoring invalid bandwidth rate %r", rate)
+            return None
+        return TokenBucket(rate) if rate > 0 else None
+
+    def set_rate(self, rate: float | None, source: str = "options") -> None:
+        """Set (or clear with None) the global rate of `source` in bytes per second.
+
+        Global limits may come from several places (the integration
+        options, the generic download config); each source keeps its own
+        rate and the lowest one is enforced.
+        """
+        bucket = self._bucket(rate)
+        if bucket is None:
+            self._global_rates.pop(source, None)
+        else:
+            self._global_rates[source] = bucket.rate
+        effective = min(self._global_rates.values(), default=None)
+        if effective != self.global_rate:
+            self._global = TokenBucket(effective) if effective else None
+
+    def set_host_rate(self, host: str, rate: float | None) -> None:
+        """Set (or clear with None) the rate for a single host."""
+        bucket = self._bucket(rate)
+        if bucket is None:
+            self._hosts.pop(host, None)
+        else:
+            self._hosts[host] = bucket
+
+    def buckets(self, host: str | None = None) -> list:
+        """Return the buckets that apply to `host`."""
+        buckets = [self._global] if self._global else []
+        if host:
+            bucket = self._hosts.get(host) or self._hosts.get(host.split(":")[0])
+            if bucket:
+                buckets.append(bucket)
+        return buckets
+
+    def rate_for(self, host: str | None = None) -> float | None:
+        """Return the effective rate for `host` in bytes/second, None if unlimited."""
+        rates = [bucket.rate for bucket in self.buckets(host)]
+        return min(rates) if rates else None
+
+    @property
+    def global_rate(self) -> float | None:
+        return self._global.rate if self._global else None
+
+    def is_limited(self, host: str | None = None) -> bool:
+        return bool(self.buckets(host))
+
+    async def consume(self, host: str | None, amount: int) -> None:
+        """Wait until `amount` bytes from `host` fit all applicable buckets."""
+        for bucket in self.buckets(host):
+            await bucket.consume(amount)
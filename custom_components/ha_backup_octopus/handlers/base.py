@@ -1,10 +1,20 @@
+import asyncio
+import hashlib
 import os
 import logging
 import json
+import time
+from contextlib import asynccontextmanager
 from functools import partial
+from urllib.parse import urlsplit
 
+import aiofiles
 import aiohttp
 
+from .encryption import ENCRYPTED_SUFFIX
+from .http_auth import host_key
+from .locking import DirectoryLock, DirectoryLockTimeout
+
 # prefer Home Assistant's shared client session when available
 try:
     from homeassistant.helpers.aiohttp_client import async_get_clientsession
@@ -13,8 +23,114 @@ except Exception:  # pragma: no cover - only available inside Home Assistant
 
 _LOGGER = logging.getLogger(__name__)
 
+# Suffix of artifacts being written; replaced by the artifact when complete.
+# Deliberately not `.tmp`, which downloaded files may legitimately end in.
+TEMP_SUFFIX = ".octopus-tmp"
+
+# Seconds allowed for the quick reachability check in `is_online`
+DEFAULT_PROBE_TIMEOUT = 3.0
+
+# Seconds; "connect" limits establishing the connection, "read" the gap
+# between two received chunks and "total" the whole request.
+DEFAULT_TIMEOUTS = {"connect": 10.0, "read": 60.0, "total": 600.0}
+
+
+def parse_timeouts(value) -> dict:
+    """Normalize a timeout setting into a dict of connect/read/total seconds.
+
+    A plain number is treated as the total timeout. Invalid or
+    non-positive values are ignored.
+    """
+    if value is None:
+        return {}
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = {"total": value}
+    if not isinstance(value, dict):
+        _LOGGER.warning("Ignoring timeout setting that is not a number or object")
+        return {}
+
+    timeouts = {}
+    for key in DEFAULT_TIMEOUTS:
+        if value.get(key) is None:
+            continue
+        try:
+            seconds = float(value[key])
+        except (TypeError, ValueError):
+            seconds = 0
+        if seconds <= 0:
+            _LOGGER.warning("Ignoring invalid %s timeout %r", key, value[key])
+            continue
+        timeouts[key] = seconds
+    return timeouts
+
+
+def host_from_device(device) -> str | None:
+    """Return the host of a registry device from its configuration URL."""
+    url = getattr(device, "configuration_url", None)
+    if not url:
+        return None
+    return urlsplit(str(url)).hostname
+
+
+class BackupSkipped(Exception):
+    """Raised by `fetch_backup` when the device's backup source is unavailable.
+
+    The run counts as not successful (status "skipped") without logging a
+    traceback.
+    """
+
+
+def file_digest(path: str) -> tuple[int, str]:
+    """Return size and SHA-256 hex digest of the file at `path` (blocking)."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as fh:
+        while chunk := fh.read(1024 * 1024):
+            digest.update(chunk)
+            size += len(chunk)
+    return size, digest.hexdigest()
+
+
+class ArtifactWriter:
+    """Async file writer returned by `DeviceBackupHandler.open_artifact`."""
+
+    def __init__(self, fh, encryptor=None) -> None:
+        self._fh = fh
+        self._encryptor = encryptor
+        # plaintext bytes written
+        self.size = 0
+        # size and digest of the stored (possibly encrypted) file
+        self.stored_size = 0
+        self._digest = hashlib.sha256()
+
+    @property
+    def sha256(self) -> str:
+        return self._digest.hexdigest()
+
+    async def _write(self, data: bytes) -> None:
+        if data:
+            self._digest.update(data)
+            self.stored_size += len(data)
+            await self._fh.write(data)
+
+    async def write(self, data: bytes) -> None:
+        self.size += len(data)
+        if self._encryptor is not None:
+            data = self._encryptor.update(data)
+        await self._write(data)
+
+    async def close(self) -> None:
+        if self._encryptor is not None:
+            await self._write(self._encryptor.finalize())
+
 
 class DeviceBackupHandler:
+    # Size of the chunks read from responses
+    CHUNK_SIZE = 64 * 1024
+    # Requests sent to one device at the same time by `fetch_all`; small
+    # devices (ESP8266/ESP32) handle only a few connections
+    MAX_PARALLEL_REQUESTS = 2
+
     def __init__(self, hass, device_name, device_id, backup_folder=None, entry=None) -> None:
         self.hass = hass
         self.device_name = device_name
@@ -22,6 +138,18 @@ class DeviceBackupHandler:
         self.backup_folder = backup_folder
         # optional: the config entry object associated with this handler
         self.entry = entry
+        self.timeouts = dict(DEFAULT_TIMEOUTS)
+        self.probe_timeout = DEFAULT_PROBE_TIMEOUT
+        # shared BandwidthLimiter, assigned by the BackupManager
+        self.bandwidth = None
+        # shared ArtifactEncryption (None = plaintext), assigned by the BackupManager
+        self.encryption = None
+        # outcome of the last run_backup: status ("ok", "failed", "offline",
+        # "locked" or "skipped"), the exception that failed it and the artifacts
+        # written ({"path", "bytes", "sha256"}, path relative to the folder)
+        self.last_status = None
+        self.last_error = None
+        self.artifacts = []
 
     async def fetch_backup(self, folder) -> None:
         """Return backup data as dictionary."""
@@ -33,6 +161,18 @@ class DeviceBackupHandler:
         Default implementation always returns True; handlers can override.
         """
         return True
+
+    def auth_kwargs(self) -> dict:
+        """Return request kwargs (e.g. auth) needed to talk to the device."""
+        return {}
+
+    def planned_urls(self) -> list[str]:
+        """Return the URLs a backup would download, for `plan_backup`.
+
+        Handlers whose URLs are only known while backing up may return a
+        partial list (or none).
+        """
+        return []
     @classmethod
     def config_entry_domain(cls) -> str | None:
         """Return the config entry domain this handler understands.
@@ -66,9 +206,28 @@ class DeviceBackupHandler:
         """
         return []
 
-    async def run_backup(self) -> None:
-        _LOGGER.info("Starting backup for %s", getattr(self, "device_name", "<unknown>"))
-        # Determine backup folder
+    @classmethod
+    def device_matchers(cls) -> list[dict]:
+        """Return device registry criteria identifying devices of this type.
+
+        Each matcher is a dict of `entry_domain` (domain of one of the
+        device's config entries), `manufacturer`, `model`,
+        `identifier_domain` and/or `connection_type`; all given fields
+        must match (case-insensitively). Return an empty list if the
+        handler does not discover devices from the registry.
+        """
+        return []
+
+    @classmethod
+    def create_handlers_from_device(cls, hass, device):
+        """Create handler instances for a matching device registry entry.
+
+        Return a list (possibly empty) of handler instances.
+        """
+        return []
+
+    def resolve_backup_folder(self) -> str:
+        """Determine (once) and return the folder this handler writes to."""
         if self.backup_folder is None:
             if self.hass:
                 self.backup_folder = self.hass.config.path(
@@ -78,6 +237,14 @@ class DeviceBackupHandler:
                 self.backup_folder = os.path.join(
                     os.path.join("backups", self.device_name), self.device_id
                 )
+        return self.backup_folder
+
+    async def run_backup(self) -> bool:
+        _LOGGER.info("Starting backup for %s", getattr(self, "device_name", "<unknown>"))
+        self.resolve_backup_folder()
+        self.last_status = None
+        self.last_error = None
+        self.artifacts = []
 
         # Create folder in executor to avoid blocking the event loop
         try:
@@ -90,34 +257,60 @@ class DeviceBackupHandler:
                 _LOGGER.exception(
                     "Could not create backup folder: %s", self.backup_folder)
 
+        # Hold the folder's lock file so no other writer interleaves with us
+        try:
+            async with DirectoryLock(self.hass, self.backup_folder):
+                return await self._run_backup_locked()
+        except DirectoryLockTimeout as exc:
+            _LOGGER.warning(
+                "Skipping backup for %s because %s is locked by another writer",
+                self.device_name,
+                self.backup_folder,
+            )
+            self.last_status, self.last_error = "locked", exc
+            return False
+        except OSError as exc:
+            _LOGGER.exception("Could not lock backup folder %s", self.backup_folder)
+            self.last_status, self.last_error = "failed", exc
+            return False
+
+    async def _run_backup_locked(self) -> bool:
+        """Write entry.json and fetch the backup while holding the folder lock."""
+        # Temp files of a run that was killed mid-write; nobody else
+        # writes here while we hold the lock.
+        try:
+            await self._executor(self._remove_temp_files)
+        except OSError:
+            _LOGGER.exception("Could not clean up %s", self.backup_folder)
+
         # Write the config entry (if any) into entry.json for reproducibility
         if getattr(self, "entry", None) is not None:
-            def _write_entry_file():
-                try:
-                    # Prefer ConfigEntry.as_dict() if available (Home Assistant)
-                    if hasattr(self.entry, "as_dict") and callable(getattr(self.entry, "as_dict")):
-                        info = self.entry.as_dict()
-                    else:
-                        # Best-effort fallback: capture common attributes
-                        info = {
-                            "entry_id": getattr(self.entry, "entry_id", None),
-                            "domain": getattr(self.entry, "domain", None),
-                            "title": getattr(self.entry, "title", None),
-                            "data": getattr(self.entry, "data", None),
-                            "options": getattr(self.entry, "options", None),
-                            "version": getattr(self.entry, "version", None),
-                            "unique_id": getattr(self.entry, "unique_id", None),
-                        }
-
-                    with open(os.path.join(self.backup_folder, "entry.json"), "w", encoding="utf-8") as fh:
-                        # Use default=str to avoid serialization errors for unknown types
-                        json.dump(info, fh, ensure_ascii=False,
-                                  indent=2, default=str)
-                except Exception:
-                    _LOGGER.exception(
-                        "Failed to write entry.json for %s", self.device_name)
+            def _serialize_entry() -> bytes:
+                # Prefer ConfigEntry.as_dict() if available (Home Assistant)
+                if hasattr(self.entry, "as_dict") and callable(getattr(self.entry, "as_dict")):
+                    info = self.entry.as_dict()
+                else:
+                    # Best-effort fallback: capture common attributes
+                    info = {
+                        "entry_id": getattr(self.entry, "entry_id", None),
+                        "domain": getattr(self.entry, "domain", None),
+                        "title": getattr(self.entry, "title", None),
+                        "data": getattr(self.entry, "data", None),
+                        "options": getattr(self.entry, "options", None),
+                        "version": getattr(self.entry, "version", None),
+                        "unique_id": getattr(self.entry, "unique_id", None),
+                    }
+                # Use default=str to avoid serialization errors for unknown types
+                return json.dumps(
+                    info, ensure_ascii=False, indent=2, default=str).encode("utf-8")
 
-            await self.hass.async_add_executor_job(_write_entry_file)
+            try:
+                data = await self._executor(_serialize_entry)
+                await self.write_artifact(
+                    os.path.join(self.backup_folder, "entry.json"), data)
+            except Exception:
+                _LOGGER.exception(
+                    "Failed to write entry.json for %s", self.device_name)
 
         try:
             online = await self.is_online()
@@ -130,15 +323,196 @@ class DeviceBackupHandler:
                 "Skipping backup for %s because the device is offline",
                 self.device_name,
             )
+            self.last_status = "offline"
             return False
 
         try:
             await self.fetch_backup(self.backup_folder)
+            self.last_status = "ok"
             return True
-        except Exception:
+        except BackupSkipped as exc:
+            _LOGGER.warning("Skipping backup of %s: %s", self.device_name, exc)
+            self.last_status, self.last_error = "skipped", exc
+            return False
+        except Exception as exc:
             _LOGGER.exception("Error during backup of %s", self.device_name)
+            self.last_status, self.last_error = "failed", exc
             return False
 
+    def client_timeout(self, overrides=None) -> aiohttp.ClientTimeout:
+        """Return the handler timeouts, updated with `overrides`, for aiohttp."""
+        timeouts = {**self.timeouts, **parse_timeouts(overrides)}
+        return aiohttp.ClientTimeout(
+            total=timeouts.get("total"),
+            sock_connect=timeouts.get("connect"),
+            sock_read=timeouts.get("read"),
+        )
+
+    async def iter_response(self, resp, host=None):
+        """Yield the response body in chunks, honouring bandwidth limits."""
+        limited = self.bandwidth is not None and self.bandwidth.is_limited(host)
+        async for chunk in resp.content.iter_chunked(self.CHUNK_SIZE):
+            if limited:
+                await self.bandwidth.consume(host, len(chunk))
+            yield chunk
+
+    async def read_response(self, resp, host=None) -> bytes:
+        """Read a response body, honouring the bandwidth limits for `host`."""
+        if self.bandwidth is None or not self.bandwidth.is_limited(host):
+            return await resp.read()
+        return b"".join([chunk async for chunk in self.iter_response(resp, host)])
+
+    async def _executor(self, func, *args):
+        """Run a blocking function in the executor (inline without hass)."""
+        if self.hass is not None:
+            return await self.hass.async_add_executor_job(func, *args)
+        return func(*args)
+
+    def _remove_temp_files(self) -> None:
+        """Remove temp files left behind by `open_artifact` in the backup folder."""
+        for dirpath, _, files in os.walk(self.backup_folder):
+            for name in files:
+                if name.endswith(TEMP_SUFFIX):
+                    _LOGGER.debug("Removing leftover %s", os.path.join(dirpath, name))
+                    os.remove(os.path.join(dirpath, name))
+
+    def record_artifact(self, path: str, size: int, sha256: str) -> None:
+        """Add a completed artifact to `artifacts` for the run report."""
+        if self.backup_folder:
+            path = os.path.relpath(path, self.backup_folder)
+        self.artifacts.append({"path": path, "bytes": size, "sha256": sha256})
+
+    def artifact_path(self, path: str) -> str:
+        """Return the on-disk name of artifact `path` (`.enc` when encrypted)."""
+        return path + ENCRYPTED_SUFFIX if self.encryption is not None else path
+
+    @asynccontextmanager
+    async def open_artifact(self, path: str):
+        """Open artifact `path` for streaming writes.
+
+        Data is written to a temporary file which replaces the artifact
+        only after the block completed, so readers never see partial
+        files. With encryption enabled the data is encrypted on the fly
+        and stored as `<path>.enc`; the copy in the other format left by
+        earlier runs is removed.
+        """
+        encryptor = self.encryption.encryptor() if self.encryption is not None else None
+        final = self.artifact_path(path)
+        stale = path if encryptor is not None else path + ENCRYPTED_SUFFIX
+        tmp = final + TEMP_SUFFIX
+        try:
+            async with aiofiles.open(tmp, "wb") as fh:
+                writer = ArtifactWriter(fh, encryptor)
+                yield writer
+                await writer.close()
+            await self._executor(os.replace, tmp, final)
+            self.record_artifact(final, writer.stored_size, writer.sha256)
+        except BaseException:
+            try:
+                await self._executor(os.remove, tmp)
+            except OSError:
+                pass
+            raise
+
+        try:
+            await self._executor(os.remove, stale)
+        except OSError:
+            pass
+
+    async def write_artifact(self, path: str, data: bytes) -> None:
+        """Write a complete artifact (see `open_artifact`)."""
+        async with self.open_artifact(path) as writer:
+            await writer.write(data)
+
+    @asynccontextmanager
+    async def http_session(self):
+        """Yield a session for a batch of requests and close it if temporary.
+
+        Using one session per batch keeps connections to the device alive
+        between requests.
+        """
+        session, close_after = await self.get_clientsession()
+        try:
+            yield session
+        finally:
+            if close_after:
+                try:
+                    await session.close()
+                except Exception:
+                    # Best-effort close; do not fail backup for cleanup issues
+                    pass
+
+    async def fetch_all(self, session, urls, **kwargs) -> list[bytes]:
+        """Fetch `urls` over `session`, at most MAX_PARALLEL_REQUESTS at a time.
+
+        Raises ValueError for non-200 responses. Extra keyword arguments
+        (e.g. auth) are passed to every request.
+        """
+        slots = asyncio.Semaphore(self.MAX_PARALLEL_REQUESTS)
+        timeout = self.client_timeout()
+
+        async def _fetch(url):
+            async with slots:
+                async with session.get(url, timeout=timeout, **kwargs) as resp:
+                    if resp.status != 200:
+                        raise ValueError(f"Failed to download {url}, status {resp.status}")
+                    return await self.read_response(resp, host_key(url))
+
+        return list(await asyncio.gather(*(_fetch(url) for url in urls)))
+
+    async def probe_size(self, session, url, **kwargs) -> int | None:
+        """Return the size of `url` without downloading it, None if unknown.
+
+        Tries HEAD first and falls back to a one-byte range GET for
+        servers (common on embedded devices) that do not answer HEAD.
+        """
+        timeout = aiohttp.ClientTimeout(total=self.probe_timeout)
+        try:
+            async with session.head(url, timeout=timeout, **kwargs) as resp:
+                if resp.status == 200 and resp.content_length is not None:
+                    return resp.content_length
+        except Exception:
+            _LOGGER.debug("HEAD %s failed; trying a range request", url)
+
+        headers = {**kwargs.pop("headers", {}), "Range": "bytes=0-0"}
+        async with session.get(url, timeout=timeout, headers=headers, **kwargs) as resp:
+            if resp.status == 206:
+                total = resp.headers.get("Content-Range", "").rpartition("/")[2]
+                return int(total) if total.isdigit() else None
+            if resp.status == 200:
+                # range ignored; the length header is enough, the body is not read
+                return resp.content_length
+            raise ValueError(f"Probe of {url} failed, status {resp.status}")
+
+    async def _plan_requests(self, session, requests) -> list[dict]:
+        """Probe `(url, kwargs)` pairs and return one plan entry per request."""
+        planned = []
+        for url, kwargs in requests:
+            started = time.monotonic()
+            entry = {"url": url, "bytes": None}
+            try:
+                entry["bytes"] = await self.probe_size(session, url, **kwargs)
+            except Exception as exc:
+                entry["error"] = str(exc)
+            entry["latency"] = round(time.monotonic() - started, 3)
+            planned.append(entry)
+        return planned
+
+    async def plan_backup(self) -> dict:
+        """Report what `run_backup` would transfer, without writing anything."""
+        plan = {"device": self.device_name, "handler": type(self).__name__, "requests": []}
+        try:
+            plan["online"] = await self.is_online()
+        except Exception:
+            plan["online"] = False
+        if not plan["online"]:
+            return plan
+
+        async with self.http_session() as session:
+            plan["requests"] = await self._plan_requests(
+                session, [(url, self.auth_kwargs()) for url in self.planned_urls()])
+        return plan
+
     async def get_clientsession(self):
         """Return an aiohttp client session and a close_after flag.
 
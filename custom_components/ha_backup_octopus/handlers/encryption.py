@@ -0,0 +1,237 @@
+"""Streaming AES-GCM encryption of backup artifacts.
+
+Encrypted files have the layout::
+
+    MAGIC (8 bytes) | log2 N (1 byte) | key salt (16 bytes) | salt (16 bytes)
+    | frame | frame | ...
+
+The master key is derived from the passphrase with scrypt (cost N, r=8,
+p=1) and the key salt, which is random per installation; keeping it in
+the header lets a file be decrypted with nothing but the passphrase.
+Each frame is a 4-byte big-endian length followed by the AES-GCM
+ciphertext (including the 16-byte tag) of up to `CHUNK_SIZE` plaintext
+bytes. Every file gets its own key, derived with HKDF from the master key
+and the random salt. The nonce is the frame counter plus a flag marking
+the final frame (the STREAM construction), so frames cannot be reordered,
+dropped or truncated without failing authentication. Memory use is
+bounded by one chunk regardless of the file size.
+
+Files of the first format (LEGACY_MAGIC) have no cost or key salt in
+their header; their master key used a fixed salt and N = 2**14. They
+can still be decrypted.
+"""
+import os
+import struct
+
+try:
+    from cryptography.exceptions import InvalidTag
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+    from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+except ImportError:  # pragma: no cover - shipped with Home Assistant
+    AESGCM = None
+
+MAGIC = b"OCTOENC2"
+LEGACY_MAGIC = b"OCTOENC1"
+SALT_SIZE = 16
+# scrypt cost of new keys (N = 2**17, 128 MiB, well under a second)
+KDF_LOG_N = 17
+# costs accepted from file headers, so a crafted file cannot stall the host
+_KDF_LOG_N_RANGE = range(14, 19)
+_LEGACY_KDF_SALT = b"ha_backup_octopus"
+_LEGACY_KDF_LOG_N = 14
+CHUNK_SIZE = 64 * 1024
+TAG_SIZE = 16
+ENCRYPTED_SUFFIX = ".enc"
+
+_LENGTH = struct.Struct(">I")
+
+
+class DecryptionError(Exception):
+    """Raised when an encrypted artifact is malformed or fails authentication."""
+
+
+def _nonce(counter: int, last: bool) -> bytes:
+    return counter.to_bytes(11, "big") + (b"\x01" if last else b"\x00")
+
+
+def derive_master_key(passphrase: str, salt: bytes, log_n: int = KDF_LOG_N) -> bytes:
+    """Derive a 32-byte master key from `passphrase` with scrypt (blocking)."""
+    if AESGCM is None:
+        raise RuntimeError("Encryption requires the cryptography package")
+    kdf = Scrypt(salt=salt, length=32, n=2**log_n, r=8, p=1)
+    return kdf.derive(passphrase.encode("utf-8"))
+
+
+class ArtifactEncryption:
+    """Holds the master key and creates per-file encryptors/decryptors.
+
+    With the passphrase at hand, files whose header names another key salt
+    or cost (other installations, the legacy format) are decrypted too.
+    """
+
+    def __init__(
+        self,
+        master_key: bytes,
+        kdf_salt: bytes,
+        log_n: int = KDF_LOG_N,
+        passphrase: str | None = None,
+    ) -> None:
+        if AESGCM is None:
+            raise RuntimeError("Encryption requires the cryptography package")
+        if len(master_key) != 32:
+            raise ValueError("Master key must be 32 bytes")
+        if len(kdf_salt) != SALT_SIZE:
+            raise ValueError(f"Key salt must be {SALT_SIZE} bytes")
+        self._master_key = master_key
+        self._kdf_salt = kdf_salt
+        self._log_n = log_n
+        self._passphrase = passphrase
+        # (key salt, log2 N) -> master key, for decrypting other headers
+        self._keys = {(kdf_salt, log_n): master_key}
+
+    @classmethod
+    def from_passphrase(
+        cls, passphrase: str, salt: bytes | None = None
+    ) -> "ArtifactEncryption":
+        """Derive the master key from a passphrase (scrypt, blocking).
+
+        `salt` is the installation's key salt; a random one is used if it
+        is not given, which is enough for decrypting files.
+        """
+        salt = salt if salt is not None else os.urandom(SALT_SIZE)
+        return cls(derive_master_key(passphrase, salt), salt, passphrase=passphrase)
+
+    def _key_for(self, kdf_salt: bytes, log_n: int) -> bytes:
+        key = self._keys.get((kdf_salt, log_n))
+        if key is None:
+            if self._passphrase is None:
+                raise DecryptionError("Artifact was encrypted with another key salt")
+            key = self._keys[(kdf_salt, log_n)] = derive_master_key(
+                self._passphrase, kdf_salt, log_n)
+        return key
+
+    @staticmethod
+    def _file_cipher(master_key: bytes, salt: bytes):
+        key = HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=salt,
+            info=b"ha_backup_octopus artifact",
+        ).derive(master_key)
+        return AESGCM(key)
+
+    def encryptor(self) -> "StreamEncryptor":
+        salt = os.urandom(SALT_SIZE)
+        header = MAGIC + bytes([self._log_n]) + self._kdf_salt + salt
+        return StreamEncryptor(self._file_cipher(self._master_key, salt), header)
+
+    @staticmethod
+    def header_size(magic: bytes) -> int:
+        """Return the size of the header starting with `magic`."""
+        if magic == MAGIC:
+            return len(MAGIC) + 1 + 2 * SALT_SIZE
+        if magic == LEGACY_MAGIC:
+            return len(LEGACY_MAGIC) + SALT_SIZE
+        raise DecryptionError("Not an encrypted backup artifact")
+
+    def decryptor(self, header: bytes) -> "StreamDecryptor":
+        """Return a decryptor for the frames following `header` (may block).
+
+        Deriving the key of another key salt or cost runs scrypt.
+        """
+        magic = header[:len(MAGIC)]
+        if len(header) != self.header_size(magic):
+            raise DecryptionError("Truncated header")
+        if magic == LEGACY_MAGIC:
+            master_key = self._key_for(_LEGACY_KDF_SALT, _LEGACY_KDF_LOG_N)
+        else:
+            log_n = header[len(MAGIC)]
+            if log_n not in _KDF_LOG_N_RANGE:
+                raise DecryptionError("Unsupported key derivation cost")
+            kdf_salt = header[len(MAGIC) + 1:len(MAGIC) + 1 + SALT_SIZE]
+            master_key = self._key_for(kdf_salt, log_n)
+        return StreamDecryptor(
+            self._file_cipher(master_key, header[-SALT_SIZE:]), header)
+
+    def decrypt_file(self, src: str, dst: str) -> None:
+        """Decrypt `src` into `dst` in constant memory (blocking)."""
+        with open(src, "rb") as fin, open(dst, "wb") as fout:
+            magic = fin.read(len(MAGIC))
+            header = magic + fin.read(self.header_size(magic) - len(magic))
+            decryptor = self.decryptor(header)
+            for chunk in decryptor.iter_frames(fin):
+                fout.write(chunk)
+
+
+class StreamEncryptor:
+    """Incrementally encrypt data; `update()`/`finalize()` return file bytes."""
+
+    def __init__(self, cipher, header: bytes) -> None:
+        self._cipher = cipher
+        self._aad = header
+        self._buffer = bytearray()
+        self._counter = 0
+        self._pending_header = header
+
+    def _frame(self, data: bytes, last: bool) -> bytes:
+        sealed = self._cipher.encrypt(_nonce(self._counter, last), bytes(data), self._aad)
+        self._counter += 1
+        return _LENGTH.pack(len(sealed)) + sealed
+
+    def _take_header(self) -> bytes:
+        header, self._pending_header = self._pending_header, b""
+        return header
+
+    def update(self, data: bytes) -> bytes:
+        self._buffer.extend(data)
+        out = [self._take_header()]
+        # Keep the last chunk buffered: only finalize() knows it is the last
+        while len(self._buffer) > CHUNK_SIZE:
+            out.append(self._frame(self._buffer[:CHUNK_SIZE], last=False))
+            del self._buffer[:CHUNK_SIZE]
+        return b"".join(out)
+
+    def finalize(self) -> bytes:
+        out = self._take_header() + self._frame(self._buffer, last=True)
+        self._buffer = bytearray()
+        return out
+
+
+class StreamDecryptor:
+    """Decrypt the frames following an artifact header."""
+
+    def __init__(self, cipher, header: bytes) -> None:
+        self._cipher = cipher
+        self._aad = header
+
+    def _read_frame(self, fh) -> bytes | None:
+        raw = fh.read(_LENGTH.size)
+        if not raw:
+            return None
+        if len(raw) != _LENGTH.size:
+            raise DecryptionError("Truncated frame header")
+        (length,) = _LENGTH.unpack(raw)
+        if length < TAG_SIZE or length > CHUNK_SIZE + TAG_SIZE:
+            raise DecryptionError("Invalid frame length")
+        frame = fh.read(length)
+        if len(frame) != length:
+            raise DecryptionError("Truncated frame")
+        return frame
+
+    def iter_frames(self, fh):
+        """Yield decrypted chunks read from the binary file object `fh`."""
+        counter = 0
+        frame = self._read_frame(fh)
+        if frame is None:
+            raise DecryptionError("Missing final frame")
+        while frame is not None:
+            following = self._read_frame(fh)
+            try:
+                yield self._cipher.decrypt(
+                    _nonce(counter, following is None), frame, self._aad)
+            except InvalidTag as exc:
+                raise DecryptionError("Artifact failed authentication") from exc
+            counter += 1
+            frame = following
@@ -0,0 +1,88 @@
+import logging
+import os
+from urllib.parse import quote
+
+import aiohttp
+
+from .base import BackupSkipped, DeviceBackupHandler
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ESPHomeBackupHandler(DeviceBackupHandler):
+    """Handler for ESPHome devices discovered via the ESPHome config entry.
+
+    The device itself does not hold its YAML; it is downloaded from the
+    ESPHome dashboard (add-on) that Home Assistant's ESPHome integration
+    knows about. Without a dashboard only entry.json (with the API
+    encryption key) is saved and the backup counts as skipped, so the
+    device still turns stale.
+    """
+
+    @classmethod
+    def config_entry_domain(cls) -> str:
+        return "esphome"
+
+    @classmethod
+    def create_handlers_from_entry(cls, hass, entry):
+        device_name = entry.data.get("device_name")
+        if not device_name:
+            _LOGGER.debug(
+                "ESPHome config entry %s has no device name; handler not created",
+                entry.entry_id,
+            )
+            return []
+        name = entry.title or device_name
+        return [ESPHomeBackupHandler(hass, name, device_name, entry=entry)]
+
+    def __init__(self, hass, device_name, esphome_name, entry=None) -> None:
+        super().__init__(hass, device_name, esphome_name, entry=entry)
+
+    def dashboard(self):
+        """Return the ESPHome dashboard coordinator, or None."""
+        if self.hass is None:
+            return None
+        try:
+            # imported lazily: the ESPHome integration is loaded by then
+            from homeassistant.components.esphome.dashboard import async_get_dashboard
+
+            return async_get_dashboard(self.hass)
+        except Exception:
+            _LOGGER.debug("ESPHome dashboard lookup failed", exc_info=True)
+            return None
+
+    def _configuration_file(self, dashboard) -> str:
+        device = (getattr(dashboard, "data", None) or {}).get(self.device_id) or {}
+        return device.get("configuration") or f"{self.device_id}.yaml"
+
+    async def is_online(self) -> bool:
+        """The YAML comes from the dashboard, so probe that instead of the device."""
+        dashboard = self.dashboard()
+        if dashboard is None:
+            # still worth saving entry.json
+            return True
+        try:
+            async with self.http_session() as session:
+                timeout = aiohttp.ClientTimeout(total=self.probe_timeout)
+                async with session.get(f"{dashboard.url}/devices", timeout=timeout) as resp:
+                    return resp.status == 200
+        except Exception:
+            return False
+
+    def _yaml_url(self, dashboard) -> str:
+        configuration = self._configuration_file(dashboard)
+        return f"{dashboard.url}/edit?configuration={quote(configuration)}"
+
+    def planned_urls(self) -> list[str]:
+        dashboard = self.dashboard()
+        return [self._yaml_url(dashboard)] if dashboard is not None else []
+
+    async def fetch_backup(self, folder) -> None:
+        dashboard = self.dashboard()
+        if dashboard is None:
+            raise BackupSkipped("no ESPHome dashboard configured; saved only entry.json")
+
+        configuration = self._configuration_file(dashboard)
+        async with self.http_session() as session:
+            (yaml,) = await self.fetch_all(session, [self._yaml_url(dashboard)])
+        await self.write_artifact(f"{folder}/{os.path.basename(configuration)}", yaml)
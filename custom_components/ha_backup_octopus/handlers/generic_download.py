@@ -1,20 +1,72 @@
 import json
 import logging
 import os
+import re
 from functools import partial
 
 import aiofiles
 
-from .base import DeviceBackupHandler
+from .bandwidth import BandwidthLimiter
+from .base import TEMP_SUFFIX, DeviceBackupHandler, file_digest, parse_timeouts
+from .encryption import ENCRYPTED_SUFFIX
+from .http_auth import (
+    HostSessions,
+    host_key,
+    new_login_session,
+    render_template,
+    request_kwargs,
+    validate_host,
+    validate_request,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
+# Partial downloads; `<file>.part.json` holds the URL and validator
+PART_SUFFIX = ".part"
+
+
+def response_validator(resp) -> str | None:
+    """Return the value to send as `If-Range` for resuming `resp`, if any.
+
+    Only strong ETags may be used with If-Range; otherwise fall back to
+    Last-Modified.
+    """
+    headers = getattr(resp, "headers", None) or {}
+    etag = headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return headers.get("Last-Modified")
+
+
+def content_range_start(resp) -> int | None:
+    """Return the first byte position of a 206 response's Content-Range."""
+    headers = getattr(resp, "headers", None) or {}
+    match = re.match(r"bytes (\d+)-", headers.get("Content-Range", ""))
+    return int(match.group(1)) if match else None
+
 
 class GenericDownloadBackupHandler(DeviceBackupHandler):
     """Download arbitrary files from configured URLs.
 
     Configuration is loaded from a JSON file under the Home Assistant
     config directory at `ha_backup_octopus_backups/generic_downloads.json`.
+
+    Besides the required `downloads` list the file may contain a `hosts`
+    object keyed by host name (optionally with port). Each host can set
+    `auth` (basic, digest, bearer or header), default `headers`, template
+    `variables` and a `login` request whose session cookie and extracted
+    values are reused for every download of that host. Download items may
+    override `method`, `headers`, `body`/`json` and `auth`; string values
+    support `${name}` placeholders filled from the host variables.
+
+    Optional `timeouts` (top level) and `timeout` (per item) accept either
+    a number of seconds for the whole request or an object with
+    `connect`, `read` and `total` seconds. An optional `bandwidth` object
+    sets `global` and per-host (`hosts`) download rates in bytes/second;
+    the lower of `global` and the limit in the integration options applies.
+
+    Interrupted GET downloads are kept as `<filename>.part` and resumed
+    with a range request on the next run (see `_download`).
     """
 
     CONFIG_RELATIVE_PATH = os.path.join(
@@ -95,8 +147,24 @@ class GenericDownloadBackupHandler(DeviceBackupHandler):
                     "Skipping invalid generic download entry without url/filename/folder"
                 )
                 continue
-            validated.append(
-                {"url": url, "filename": filename, "folder": target_folder})
+            if filename.endswith(TEMP_SUFFIX):
+                # would be removed as a leftover temp file at the next run
+                _LOGGER.warning(
+                    "Skipping generic download %s: filename must not end in %s",
+                    filename,
+                    TEMP_SUFFIX,
+                )
+                continue
+            entry = {
+                "url": url,
+                "filename": filename,
+                "folder": target_folder,
+                **validate_request(item),
+            }
+            timeout = parse_timeouts(item.get("timeout"))
+            if timeout:
+                entry["timeout"] = timeout
+            validated.append(entry)
 
         if not validated:
             _LOGGER.warning(
@@ -104,9 +172,34 @@ class GenericDownloadBackupHandler(DeviceBackupHandler):
             )
             return None
 
+        hosts = {}
+        raw_hosts = data.get("hosts") or {}
+        if not isinstance(raw_hosts, dict):
+            _LOGGER.warning(
+                "Generic download config 'hosts' must be an object; ignoring")
+            raw_hosts = {}
+        for name, host_cfg in raw_hosts.items():
+            host = validate_host(host_cfg)
+            if host is None:
+                _LOGGER.warning(
+                    "Skipping invalid host settings for %s in generic config", name)
+                continue
+            hosts[name] = host
+
         _LOGGER.info(
             "Generic download config loaded with %d entries", len(validated))
-        return {"downloads": validated}
+        bandwidth = data.get("bandwidth") or {}
+        if not isinstance(bandwidth, dict):
+            _LOGGER.warning(
+                "Generic download config 'bandwidth' must be an object; ignoring")
+            bandwidth = {}
+
+        return {
+            "downloads": validated,
+            "hosts": hosts,
+            "timeouts": parse_timeouts(data.get("timeouts")),
+            "bandwidth": bandwidth,
+        }
 
     @classmethod
     def find_entries(cls, hass):
@@ -128,9 +221,12 @@ class GenericDownloadBackupHandler(DeviceBackupHandler):
             )
         ]
 
-    def __init__(self, hass, device_name, device_id, downloads=None, entry=None) -> None:
+    def __init__(self, hass, device_name, device_id, downloads=None, hosts=None, entry=None) -> None:
         super().__init__(hass, device_name, device_id, entry=entry)
         self.downloads = list(downloads) if downloads else None
+        self.hosts = dict(hosts) if hosts else {}
+        # timeouts from the config file, layered over the handler timeouts
+        self.config_timeouts = {}
 
     async def _ensure_downloads_loaded(self) -> bool:
         """Load downloads from config if not already set."""
@@ -146,8 +242,68 @@ class GenericDownloadBackupHandler(DeviceBackupHandler):
             return False
 
         self.downloads = list(downloads)
+        self.hosts = cfg.get("hosts") or {}
+        self.config_timeouts = cfg.get("timeouts") or {}
+        self._apply_bandwidth(cfg.get("bandwidth"))
         return True
 
+    def _apply_bandwidth(self, bandwidth) -> None:
+        """Apply the configured rates to the (shared) bandwidth limiter."""
+        if not bandwidth:
+            return
+        if self.bandwidth is None:
+            self.bandwidth = BandwidthLimiter()
+        if "global" in bandwidth:
+            self.bandwidth.set_rate(bandwidth.get("global"), source="generic_downloads")
+        for host, rate in (bandwidth.get("hosts") or {}).items():
+            self.bandwidth.set_host_rate(host, rate)
+
+    def create_login_session(self):
+        """Return a new session with its own cookie jar for a host login."""
+        return new_login_session()
+
+    async def plan_backup(self) -> dict:
+        """Probe every configured download; host logins are performed."""
+        plan = {"device": self.device_name, "handler": type(self).__name__, "requests": []}
+        plan["online"] = await self._ensure_downloads_loaded()
+        if not plan["online"]:
+            return plan
+
+        session, close_after = await self.get_clientsession()
+        sessions = HostSessions(session, self.hosts, self.create_login_session)
+        try:
+            for item in self.downloads:
+                url = item["url"]
+                host = host_key(url)
+                if item.get("method", "GET") != "GET":
+                    plan["requests"].append(
+                        {"url": url, "bytes": None, "error": "not probed: not a GET request"})
+                    continue
+                try:
+                    host_session, variables = await sessions.get(host)
+                except Exception as exc:
+                    plan["requests"].append({"url": url, "bytes": None, "error": str(exc)})
+                    continue
+                host_cfg = sessions.host_config(host)
+                request = item if item.get("auth") else {
+                    **item, "auth": host_cfg.get("auth")}
+                kwargs = request_kwargs(request, variables, host_cfg.get("headers"))
+                kwargs.pop("json", None)
+                kwargs.pop("data", None)
+                (entry,) = await self._plan_requests(
+                    host_session, [(render_template(url, variables), kwargs)])
+                # report the configured URL, not one with filled-in secrets
+                entry["url"] = url
+                plan["requests"].append(entry)
+        finally:
+            await sessions.close()
+            if close_after:
+                try:
+                    await session.close()
+                except Exception:
+                    pass
+        return plan
+
     async def fetch_backup(self, folder) -> None:
         _LOGGER.info("Generic backup started")
         loaded = await self._ensure_downloads_loaded()
@@ -158,6 +314,7 @@ class GenericDownloadBackupHandler(DeviceBackupHandler):
             return
 
         session, close_after = await self.get_clientsession()
+        sessions = HostSessions(session, self.hosts, self.create_login_session)
 
         try:
             for item in self.downloads:
@@ -168,12 +325,13 @@ class GenericDownloadBackupHandler(DeviceBackupHandler):
                     raise ValueError(
                         "Download item must include url, filename and folder")
 
-                async with session.get(url) as resp:
-                    if resp.status != 200:
-                        raise ValueError(
-                            f"Failed to download {url}, status {resp.status}"
-                        )
-                    data: bytes = await resp.read()
+                host = host_key(url)
+                timeout = self.client_timeout(
+                    {**self.config_timeouts, **item.get("timeout", {})})
+                host_session, variables = await sessions.get(host, timeout=timeout)
+                host_cfg = sessions.host_config(host)
+                request = item if item.get("auth") else {
+                    **item, "auth": host_cfg.get("auth")}
 
                 target_dir = os.path.join(folder, subfolder)
                 # Ensure per-download folder exists to avoid flat structures
@@ -190,13 +348,136 @@ class GenericDownloadBackupHandler(DeviceBackupHandler):
 
                 target_path = os.path.join(target_dir, filename)
                 _LOGGER.info("Generic download: saving %s -> %s",
-                             url, target_path)
-                async with aiofiles.open(target_path, "wb") as fh:
-                    await fh.write(data)
+                             url, self.artifact_path(target_path))
+                await self._download(
+                    host_session,
+                    item.get("method", "GET"),
+                    url,
+                    render_template(url, variables),
+                    target_path,
+                    host,
+                    timeout=timeout,
+                    **request_kwargs(request, variables, host_cfg.get("headers")),
+                )
         finally:
+            await sessions.close()
             if close_after:
                 try:
                     await session.close()
                 except Exception:
                     # Cleanup best effort; do not raise on close failure
                     pass
+
+    async def _download(self, session, method, url, rendered_url, target_path, host, **kwargs) -> None:
+        """Stream one download into its artifact, resuming a partial download.
+
+        GET downloads are written to `<target>.part`. When the response
+        carries a validator (strong ETag or Last-Modified) it is saved in
+        `<target>.part.json`, and a transfer that breaks off leaves both
+        files behind. The next attempt requests only the missing bytes with
+        `Range` and `If-Range`; a server without range support, or a file
+        that changed in between, answers with the full body, which
+        replaces the partial data.
+
+        Other methods and encrypted artifacts (whose encryption state
+        cannot be resumed) are always downloaded in full.
+        """
+        part = target_path + PART_SUFFIX
+        if method != "GET" or self.encryption is not None:
+            await self._executor(self._remove_part, part)
+            async with session.request(method, rendered_url, **kwargs) as resp:
+                if resp.status != 200:
+                    raise ValueError(f"Failed to download {url}, status {resp.status}")
+                # Stream to disk so large files use constant memory
+                async with self.open_artifact(target_path) as fh:
+                    async for chunk in self.iter_response(resp, host):
+                        await fh.write(chunk)
+            return
+
+        headers = kwargs.pop("headers", None) or {}
+        state = await self._executor(self._load_part, part, url)
+        while True:
+            request_headers = dict(headers)
+            if state is not None:
+                request_headers["Range"] = f"bytes={state['size']}-"
+                request_headers["If-Range"] = state["validator"]
+            async with session.request(
+                "GET", rendered_url, headers=request_headers, **kwargs
+            ) as resp:
+                if resp.status == 416 and state is not None:
+                    # the partial data does not fit the file any more
+                    _LOGGER.info("Discarding partial download of %s", url)
+                    state = None
+                    continue
+                if resp.status == 206 and state is not None:
+                    if content_range_start(resp) != state["size"]:
+                        await self._executor(self._remove_part, part)
+                        raise ValueError(f"Unexpected range in response for {url}")
+                    _LOGGER.info(
+                        "Generic download: resuming %s at byte %d", url, state["size"])
+                    mode = "ab"
+                elif resp.status == 200:
+                    if state is not None:
+                        _LOGGER.debug("Server sent all of %s; restarting download", url)
+                    await self._executor(
+                        self._save_part_state, part, url, response_validator(resp))
+                    mode = "wb"
+                else:
+                    raise ValueError(f"Failed to download {url}, status {resp.status}")
+
+                async with aiofiles.open(part, mode) as fh:
+                    async for chunk in self.iter_response(resp, host):
+                        await fh.write(chunk)
+            break
+
+        await self._executor(self._finish_part, part, target_path)
+        self.record_artifact(target_path, *await self._executor(file_digest, target_path))
+
+    @staticmethod
+    def _load_part(part: str, url: str) -> dict | None:
+        """Return {"size", "validator"} of a resumable partial download of `url`."""
+        try:
+            with open(part + ".json", "r", encoding="utf-8") as fh:
+                state = json.load(fh)
+            size = os.path.getsize(part)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(state, dict) or state.get("url") != url:
+            return None
+        if not state.get("validator") or size <= 0:
+            return None
+        return {"size": size, "validator": state["validator"]}
+
+    @staticmethod
+    def _save_part_state(part: str, url: str, validator: str | None) -> None:
+        if validator is None:
+            # nothing to check a resumed range against; never resume
+            GenericDownloadBackupHandler._remove_part_state(part)
+            return
+        with open(part + ".json", "w", encoding="utf-8") as fh:
+            json.dump({"url": url, "validator": validator}, fh)
+
+    @staticmethod
+    def _remove_part_state(part: str) -> None:
+        try:
+            os.remove(part + ".json")
+        except OSError:
+            pass
+
+    @staticmethod
+    def _remove_part(part: str) -> None:
+        for path in (part, part + ".json"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _finish_part(part: str, target_path: str) -> None:
+        """Move a completed download into place."""
+        os.replace(part, target_path)
+        GenericDownloadBackupHandler._remove_part_state(part)
+        try:
+            os.remove(target_path + ENCRYPTED_SUFFIX)
+        except OSError:
+            pass
@@ -0,0 +1,232 @@
+"""Authentication, header and login helpers for HTTP based handlers.
+
+Handlers describe requests with small dictionaries (usually read from a
+JSON config file). The helpers here turn those descriptions into aiohttp
+request keyword arguments and manage per-host login sessions so a login
+is performed once per host and reused for every item of that host.
+"""
+import logging
+from string import Template
+from urllib.parse import urlsplit
+
+import aiohttp
+
+_LOGGER = logging.getLogger(__name__)
+
+AUTH_TYPES = ("basic", "digest", "bearer", "header")
+
+
+def host_key(url: str) -> str:
+    """Return the host (including an explicit port) for `url`."""
+    return urlsplit(url).netloc
+
+
+def render_template(value, variables):
+    """Substitute `$name`/`${name}` placeholders in strings, lists and dicts.
+
+    Unknown placeholders are left untouched so literal dollar signs in
+    bodies do not break requests.
+    """
+    if not variables:
+        return value
+    if isinstance(value, str):
+        return Template(value).safe_substitute(variables)
+    if isinstance(value, dict):
+        return {k: render_template(v, variables) for k, v in value.items()}
+    if isinstance(value, list):
+        return [render_template(v, variables) for v in value]
+    return value
+
+
+def validate_auth(auth) -> dict | None:
+    """Return a normalized auth dict or None if `auth` is unusable."""
+    if auth is None:
+        return None
+    if not isinstance(auth, dict):
+        _LOGGER.warning("Ignoring auth setting that is not an object")
+        return None
+    auth_type = str(auth.get("type", "basic")).lower()
+    if auth_type not in AUTH_TYPES:
+        _LOGGER.warning("Ignoring unknown auth type %s", auth_type)
+        return None
+    if auth_type in ("basic", "digest") and not auth.get("username"):
+        _LOGGER.warning("Ignoring %s auth without username", auth_type)
+        return None
+    if auth_type in ("bearer", "header") and not auth.get("token"):
+        _LOGGER.warning("Ignoring %s auth without token", auth_type)
+        return None
+    return {**auth, "type": auth_type}
+
+
+def validate_request(item: dict) -> dict:
+    """Return the optional request settings (method, headers, body) of `item`."""
+    request = {"method": str(item.get("method") or "GET").upper()}
+    headers = item.get("headers")
+    if isinstance(headers, dict):
+        request["headers"] = {str(k): str(v) for k, v in headers.items()}
+    elif headers is not None:
+        _LOGGER.warning("Ignoring headers that are not an object")
+    if item.get("json") is not None:
+        request["json"] = item["json"]
+    elif item.get("body") is not None:
+        request["body"] = str(item["body"])
+    auth = validate_auth(item.get("auth"))
+    if auth:
+        request["auth"] = auth
+    return request
+
+
+def validate_host(cfg) -> dict | None:
+    """Validate a per-host settings object from the `hosts` section."""
+    if not isinstance(cfg, dict):
+        return None
+    host = validate_request(cfg)
+    host.pop("method", None)
+    variables = cfg.get("variables")
+    if isinstance(variables, dict):
+        host["variables"] = {str(k): str(v) for k, v in variables.items()}
+    login = cfg.get("login")
+    if isinstance(login, dict) and login.get("url"):
+        host["login"] = {
+            **validate_request({"method": "POST", **login}),
+            "url": login["url"],
+            "extract": dict(login.get("extract") or {}),
+        }
+    elif login is not None:
+        _LOGGER.warning("Ignoring login without url")
+    return host
+
+
+def request_kwargs(request: dict, variables=None, extra_headers=None) -> dict:
+    """Build aiohttp request kwargs from a validated request description."""
+    headers = render_template(dict(extra_headers or {}), variables)
+    headers.update(render_template(request.get("headers") or {}, variables))
+    kwargs = {}
+
+    auth = request.get("auth")
+    if auth:
+        auth = render_template(auth, variables)
+        if auth["type"] == "basic":
+            kwargs["auth"] = aiohttp.BasicAuth(
+                auth["username"], auth.get("password", ""))
+        elif auth["type"] == "digest":
+            middleware = getattr(aiohttp, "DigestAuthMiddleware", None)
+            if middleware is None:
+                raise ValueError(
+                    "Digest auth requires aiohttp with DigestAuthMiddleware")
+            kwargs["middlewares"] = (
+                middleware(auth["username"], auth.get("password", "")),)
+        elif auth["type"] == "bearer":
+            headers["Authorization"] = f"Bearer {auth['token']}"
+        else:
+            headers[auth.get("header", "Authorization")] = auth["token"]
+
+    if headers:
+        kwargs["headers"] = headers
+    if "json" in request:
+        kwargs["json"] = render_template(request["json"], variables)
+    elif "body" in request:
+        kwargs["data"] = render_template(request["body"], variables)
+    return kwargs
+
+
+def _lookup(data, path: str):
+    """Resolve a dotted `path` inside nested JSON `data`."""
+    for part in path.split("."):
+        if isinstance(data, dict):
+            data = data.get(part)
+        elif isinstance(data, list) and part.isdigit() and int(part) < len(data):
+            data = data[int(part)]
+        else:
+            return None
+    return data
+
+
+def new_login_session():
+    """Return a session with a private cookie jar for a host login."""
+    # unsafe=True keeps cookies for hosts addressed by IP
+    return aiohttp.ClientSession(cookie_jar=aiohttp.CookieJar(unsafe=True))
+
+
+class HostSessions:
+    """Per-host sessions and template variables for one backup run.
+
+    Hosts without a `login` share the default session. Hosts with a login
+    get their own cookie jar so session cookies never leak into Home
+    Assistant's shared session; the login is performed on first use and
+    the resulting session and extracted variables are reused for every
+    later request to that host.
+    """
+
+    def __init__(self, default_session, hosts=None, session_factory=None) -> None:
+        self._default = default_session
+        self._hosts = hosts or {}
+        self._factory = session_factory or new_login_session
+        self._sessions = {}
+        self._variables = {}
+
+    def host_config(self, host: str) -> dict:
+        cfg = self._hosts.get(host)
+        if cfg is None:
+            cfg = self._hosts.get(host.split(":")[0], {})
+        return cfg
+
+    async def get(self, host: str, **kwargs):
+        """Return `(session, variables)` for `host`, logging in if needed.
+
+        Extra keyword arguments are passed to the login request (e.g. a
+        timeout).
+        """
+        if host in self._sessions:
+            return self._sessions[host], self._variables[host]
+
+        cfg = self.host_config(host)
+        variables = {"host": host, **cfg.get("variables", {})}
+        login = cfg.get("login")
+        if not login:
+            self._sessions[host] = self._default
+            self._variables[host] = variables
+            return self._default, variables
+
+        session = self._factory()
+        try:
+            variables.update(await self._login(session, host, login, variables, **kwargs))
+        except Exception:
+            await session.close()
+            raise
+        self._sessions[host] = session
+        self._variables[host] = variables
+        return session, variables
+
+    async def _login(self, session, host, login, variables, **kwargs) -> dict:
+        _LOGGER.debug("Logging in to %s", host)
+        url = render_template(login["url"], variables)
+        async with session.request(
+            login["method"], url, **request_kwargs(login, variables), **kwargs
+        ) as resp:
+            if resp.status >= 400:
+                raise ValueError(f"Login to {host} failed, status {resp.status}")
+            extract = login.get("extract")
+            if not extract:
+                return {}
+            data = await resp.json(content_type=None)
+
+        extracted = {}
+        for name, path in extract.items():
+            value = _lookup(data, str(path))
+            if value is None:
+                raise ValueError(f"Login to {host} returned no value for {path}")
+            extracted[name] = str(value)
+        return extracted
+
+    async def close(self) -> None:
+        """Close every login session created during the run."""
+        for session in self._sessions.values():
+            if session is self._default:
+                continue
+            try:
+                await session.close()
+            except Exception:
+                pass
+        self._sessions.clear()
+        self._variables.clear()
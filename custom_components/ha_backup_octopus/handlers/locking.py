@@ -0,0 +1,97 @@
+"""Lock file guarding a backup folder against concurrent writers.
+
+The in-process guarantees come from the BackupManager's per-device
+asyncio locks; the lock file additionally protects a folder against
+other processes (e.g. a second Home Assistant instance or a helper
+script sharing the config directory).
+"""
+import asyncio
+import logging
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class DirectoryLockTimeout(Exception):
+    """Raised when a backup folder stays locked by someone else."""
+
+
+class DirectoryLock:
+    """Async context manager holding an exclusive lock file in `folder`."""
+
+    LOCK_FILENAME = ".octopus.lock"
+
+    def __init__(self, hass, folder, timeout: float = 300, poll_interval: float = 0.5) -> None:
+        self.hass = hass
+        self.path = os.path.join(folder, self.LOCK_FILENAME)
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._fd = None
+
+    async def _run(self, func, *args):
+        if self.hass is not None:
+            return await self.hass.async_add_executor_job(func, *args)
+        return func(*args)
+
+    def _try_acquire(self) -> bool:
+        fd = os.open(self.path, os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+
+    def _release(self) -> None:
+        fd, self._fd = self._fd, None
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    async def __aenter__(self):
+        if fcntl is None:
+            _LOGGER.debug("fcntl unavailable; not locking %s", self.path)
+            return self
+
+        deadline = time.monotonic() + self.timeout
+        while not await self._acquire_once():
+            if time.monotonic() >= deadline:
+                raise DirectoryLockTimeout(f"Timed out waiting for {self.path}")
+            _LOGGER.debug("Waiting for lock %s", self.path)
+            await asyncio.sleep(self.poll_interval)
+        return self
+
+    async def _acquire_once(self) -> bool:
+        """Try to take the lock once, in the executor when running in HA."""
+        if self.hass is None:
+            return self._try_acquire()
+        job = self.hass.async_add_executor_job(self._try_acquire)
+        try:
+            # shielded: cancelling us must not abandon a job that may
+            # still take the lock
+            return await asyncio.shield(job)
+        except asyncio.CancelledError:
+            # cancelled (e.g. on shutdown) while trying; give back a lock
+            # the executor job took in the meantime
+            try:
+                acquired = await job
+            except Exception:
+                acquired = False
+            if acquired:
+                self._release()
+            raise
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._fd is not None:
+            await self._run(self._release)
+        return False
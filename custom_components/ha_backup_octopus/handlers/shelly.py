@@ -0,0 +1,138 @@
+import json
+import os
+import re
+from functools import partial
+from urllib.parse import quote
+
+import aiohttp
+
+from .base import DeviceBackupHandler, host_from_device
+from .http_auth import request_kwargs, validate_auth
+
+
+class ShellyBackupHandler(DeviceBackupHandler):
+    """Handler for Shelly devices discovered via the Shelly config entry.
+
+    Gen1 devices expose their settings at `/settings`; Gen2+ devices are
+    backed up through RPC (`Shelly.GetConfig`) including the code of all
+    scripts. Credentials stored in the config entry are used for basic
+    (Gen1) or digest (Gen2+) authentication.
+    """
+
+    @classmethod
+    def config_entry_domain(cls) -> str:
+        return "shelly"
+
+    @classmethod
+    def create_handlers_from_entry(cls, hass, entry):
+        host = entry.data.get("host")
+        if not host:
+            return []
+        name = entry.title or f"shelly-{entry.entry_id}"
+        return [
+            ShellyBackupHandler(
+                hass,
+                name,
+                host,
+                gen=entry.data.get("gen"),
+                username=entry.data.get("username"),
+                password=entry.data.get("password"),
+                entry=entry,
+            )
+        ]
+
+    @classmethod
+    def device_matchers(cls) -> list[dict]:
+        # Shelly devices integrated without a Shelly entry (e.g. via MQTT)
+        return [{"manufacturer": "Shelly"}]
+
+    @classmethod
+    def create_handlers_from_device(cls, hass, device):
+        host = host_from_device(device)
+        if not host:
+            return []
+        name = device.name_by_user or device.name or f"shelly-{host}"
+        return [ShellyBackupHandler(hass, name, host)]
+
+    def __init__(self, hass, device_name, host, gen=None, username=None, password=None, entry=None) -> None:
+        super().__init__(hass, device_name, host, entry=entry)
+        self.gen = gen
+        self.username = username
+        self.password = password
+
+    def auth_kwargs(self) -> dict:
+        if not self.password:
+            return {}
+        if self.gen and self.gen >= 2:
+            auth = {"type": "digest", "username": "admin", "password": self.password}
+        else:
+            auth = {"type": "basic", "username": self.username or "admin", "password": self.password}
+        return request_kwargs({"auth": validate_auth(auth)})
+
+    async def is_online(self) -> bool:
+        """Probe `/shelly` (no auth needed) and learn the generation."""
+        try:
+            async with self.http_session() as session:
+                timeout = aiohttp.ClientTimeout(total=self.probe_timeout)
+                async with session.get(f"http://{self.device_id}/shelly", timeout=timeout) as resp:
+                    if resp.status != 200:
+                        return False
+                    info = await resp.json(content_type=None)
+        except Exception:
+            return False
+        if not self.gen:
+            self.gen = info.get("gen", 1) if isinstance(info, dict) else 1
+        return True
+
+    def planned_urls(self) -> list[str]:
+        # Script code is fetched per script and is not included
+        if not self.gen or self.gen < 2:
+            paths = ["/settings", "/settings/actions"]
+        else:
+            paths = ["/rpc/Shelly.GetConfig", "/rpc/Script.List"]
+        return [f"http://{self.device_id}{path}" for path in paths]
+
+    async def _get_json(self, session, path: str):
+        (data,) = await self.fetch_all(
+            session, [f"http://{self.device_id}{path}"], **self.auth_kwargs())
+        return json.loads(data)
+
+    async def fetch_backup(self, folder) -> None:
+        async with self.http_session() as session:
+            if not self.gen or self.gen < 2:
+                settings, actions = await self.fetch_all(
+                    session, self.planned_urls(), **self.auth_kwargs())
+                await self.write_artifact(f"{folder}/settings.json", settings)
+                await self.write_artifact(f"{folder}/actions.json", actions)
+                return
+
+            config, scripts = await self.fetch_all(
+                session, self.planned_urls(), **self.auth_kwargs())
+            await self.write_artifact(f"{folder}/config.json", config)
+            await self.write_artifact(f"{folder}/scripts.json", scripts)
+
+            scripts_folder = os.path.join(folder, "scripts")
+            await self._executor(partial(os.makedirs, scripts_folder, exist_ok=True))
+            for script in json.loads(scripts).get("scripts", []):
+                code = await self._get_script_code(session, script["id"])
+                name = re.sub(r"[^\w.-]+", "_", script.get("name") or "script")
+                await self.write_artifact(
+                    os.path.join(scripts_folder, f"{script['id']}_{name}.js"),
+                    code.encode("utf-8"),
+                )
+
+    async def _get_script_code(self, session, script_id) -> str:
+        """Read a script's code; the device returns it in pieces."""
+        parts = []
+        offset = 0
+        while True:
+            result = await self._get_json(
+                session,
+                f"/rpc/Script.GetCode?id={quote(str(script_id))}&offset={offset}",
+            )
+            data = result.get("data", "")
+            parts.append(data)
+            # offset and left count bytes of the UTF-8 code, not characters
+            offset += len(data.encode("utf-8"))
+            if not result.get("left") or not data:
+                return "".join(parts)
@@ -0,0 +1,63 @@
+import aiohttp
+
+from .base import DeviceBackupHandler, host_from_device
+
+
+class TasmotaBackupHandler(DeviceBackupHandler):
+    """Handler for Tasmota devices.
+
+    Home Assistant's Tasmota integration uses a single MQTT discovery
+    config entry for all devices, so devices are taken from the device
+    registry (devices of a `tasmota` config entry) and their host from the
+    configuration URL Tasmota publishes.
+    """
+
+    CONFIG_URL = "http://{host}/dl"
+    STATUS_URL = "http://{host}/cm?cmnd=Status%200"
+
+    @classmethod
+    def device_matchers(cls) -> list[dict]:
+        return [{"entry_domain": "tasmota"}, {"manufacturer": "Tasmota"}]
+
+    @classmethod
+    def create_handlers_from_device(cls, hass, device):
+        host = host_from_device(device)
+        if not host:
+            return []
+        name = device.name_by_user or device.name or f"tasmota-{host}"
+        return [TasmotaBackupHandler(hass, name, host)]
+
+    def __init__(self, hass, device_name, host, entry=None) -> None:
+        super().__init__(hass, device_name, host, entry=entry)
+
+    async def is_online(self) -> bool:
+        """Check if the device answers a status command."""
+        try:
+            async with self.http_session() as session:
+                timeout = aiohttp.ClientTimeout(total=self.probe_timeout)
+                url = f"http://{self.device_id}/cm?cmnd=Status"
+                async with session.get(url, timeout=timeout) as resp:
+                    return resp.status == 200
+        except Exception:
+            return False
+
+    def planned_urls(self) -> list[str]:
+        return [
+            self.CONFIG_URL.format(host=self.device_id),
+            self.STATUS_URL.format(host=self.device_id),
+        ]
+
+    async def fetch_backup(self, folder) -> None:
+        # The config dump (restorable via "Restore Configuration") plus the
+        # full status for reference, fetched over one pooled session.
+        async with self.http_session() as session:
+            config, status = await self.fetch_all(
+                session,
+                [
+                    self.CONFIG_URL.format(host=self.device_id),
+                    self.STATUS_URL.format(host=self.device_id),
+                ],
+            )
+
+        await self.write_artifact(f"{folder}/Config.dmp", config)
+        await self.write_artifact(f"{folder}/status.json", status)
@@ -1,6 +1,10 @@
 import aiohttp
-import aiofiles
-from .base import DeviceBackupHandler
+from .base import DeviceBackupHandler, host_from_device
+
+try:
+    from homeassistant.helpers import device_registry as dr
+except Exception:  # pragma: no cover - only available inside Home Assistant
+    dr = None
 
 
 class WLEDBackupHandler(DeviceBackupHandler):
@@ -20,13 +24,20 @@ class WLEDBackupHandler(DeviceBackupHandler):
         """Create handler(s) from a WLED config entry.
 
         The entry may contain `host`, `ip_address`, `host_ip`, or
-        `host_name`. If not found, the device registry is inspected as a
-        fallback (same logic as before, encapsulated here).
+        `host_name`. If not found, the configuration URL of the entry's
+        devices in the device registry is used as a fallback.
         """
         name = entry.title or f"wled-{entry.entry_id}"
         host = entry.data.get("host") or entry.data.get(
             "ip_address") or entry.data.get("host_ip") or entry.data.get("host_name")
 
+        if not host and dr is not None:
+            registry = dr.async_get(hass)
+            for device in dr.async_entries_for_config_entry(registry, entry.entry_id):
+                host = host_from_device(device)
+                if host:
+                    break
+
         if not host:
             hass.logger.warning(
                 "WLED config entry %s has no host info; handler not created",
@@ -37,6 +48,19 @@ class WLEDBackupHandler(DeviceBackupHandler):
         handler = WLEDBackupHandler(hass, name, host, entry=entry)
         return [handler]
 
+    @classmethod
+    def device_matchers(cls) -> list[dict]:
+        return [{"manufacturer": "WLED"}]
+
+    @classmethod
+    def create_handlers_from_device(cls, hass, device):
+        """Create a handler for a WLED device found in the device registry."""
+        host = host_from_device(device)
+        if not host:
+            return []
+        name = device.name_by_user or device.name or f"wled-{host}"
+        return [WLEDBackupHandler(hass, name, host)]
+
     def __init__(self, hass, device_name, ip_address, entry=None) -> None:
         super().__init__(hass, device_name, ip_address, entry=entry)
 
@@ -45,7 +69,7 @@ class WLEDBackupHandler(DeviceBackupHandler):
         session, close_after = await self.get_clientsession()
         try:
             # Small timeout to avoid hanging startup; cache hit if WLED is up.
-            timeout = aiohttp.ClientTimeout(total=3)
+            timeout = aiohttp.ClientTimeout(total=self.probe_timeout)
             info_url = f"http://{self.device_id}/json/info"
             async with session.get(info_url, timeout=timeout) as resp:
                 return resp.status == 200
@@ -58,6 +82,12 @@ class WLEDBackupHandler(DeviceBackupHandler):
                 except Exception:
                     pass
 
+    def planned_urls(self) -> list[str]:
+        return [
+            f"http://{self.device_id}/cfg.json",
+            f"http://{self.device_id}/presets.json",
+        ]
+
     async def fetch_backup(self, folder) -> None:
         # Use centralized helper from base class to obtain a session.
         session, close_after = await self.get_clientsession()
@@ -65,21 +95,21 @@ class WLEDBackupHandler(DeviceBackupHandler):
         cfg_url: str = f"http://{self.device_id}/cfg.json"
         presets_url: str = f"http://{self.device_id}/presets.json"
 
-        async with session.get(cfg_url) as resp:
-            cfg_data: bytes = await resp.read()
-        async with session.get(presets_url) as resp:
-            presets_data: bytes = await resp.read()
+        # Close the temporary session even when a request times out.
+        try:
+            timeout = self.client_timeout()
+            async with session.get(cfg_url, timeout=timeout) as resp:
+                cfg_data: bytes = await self.read_response(resp, self.device_id)
+            async with session.get(presets_url, timeout=timeout) as resp:
+                presets_data: bytes = await self.read_response(resp, self.device_id)
+        finally:
+            if close_after:
+                try:
+                    await session.close()
+                except Exception:
+                    # Best-effort close; do not fail backup for cleanup issues
+                    pass
 
         # save both files to disk asynchronously
-        async with aiofiles.open(f"{folder}/cfg.json", "wb") as f:
-            await f.write(cfg_data)
-        async with aiofiles.open(f"{folder}/presets.json", "wb") as f:
-            await f.write(presets_data)
-
-        # Close the temporary session if we created one.
-        if close_after:
-            try:
-                await session.close()
-            except Exception:
-                # Best-effort close; do not fail backup for cleanup issues
-                pass
+        await self.write_artifact(f"{folder}/cfg.json", cfg_data)
+        await self.write_artifact(f"{folder}/presets.json", presets_data)
@@ -0,0 +1,236 @@
+"""Per-device backup health, maintained incrementally from run results.
+
+Every device is in exactly one category:
+
+- `failed`: the last attempt failed,
+- `stale`: no successful backup within `stale_days` (or never),
+- `fresh`: otherwise.
+
+Categories change when a backup finishes or when a fresh device's last
+success becomes too old. Results update the counters directly; expiries
+are tracked in a heap so a single timer fires at the next transition.
+Nothing polls or scans the backup folders. Listeners are called with the
+key of the device that changed: summary listeners for every change,
+per-device listeners only for their own key.
+"""
+import heapq
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+
+from homeassistant.core import callback
+from homeassistant.util import dt as dt_util
+
+try:
+    from homeassistant.helpers.event import async_track_point_in_utc_time
+    from homeassistant.helpers.storage import Store
+except Exception:  # pragma: no cover - only available inside Home Assistant
+    async_track_point_in_utc_time = None
+    Store = None
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_KEY = "ha_backup_octopus.health"
+STORAGE_VERSION = 1
+SAVE_DELAY = 10
+
+FRESH = "fresh"
+STALE = "stale"
+FAILED = "failed"
+CATEGORIES = (FRESH, STALE, FAILED)
+
+
+def device_key(handler) -> str:
+    """Return the stable health key of a handler's device."""
+    return f"{type(handler).__name__}:{getattr(handler, 'device_id', None)}"
+
+
+class BackupHealth:
+    def __init__(self, hass, stale_days: float = 7) -> None:
+        self.hass = hass
+        self.stale_after = timedelta(days=stale_days)
+        # key -> {"name", "last_success", "last_attempt", "last_ok"}
+        self.records = {}
+        self.categories = {}
+        self.counts = Counter({c: 0 for c in CATEGORIES})
+        self._expiries = []
+        self._unsub_timer = None
+        self._listeners = []
+        # key -> listeners interested in that device only
+        self._key_listeners = {}
+        self._device_listeners = []
+        self._store = (
+            Store(hass, STORAGE_VERSION, STORAGE_KEY)
+            if hass is not None and Store is not None
+            else None
+        )
+
+    async def async_load(self) -> None:
+        """Restore the records saved by a previous run of Home Assistant."""
+        if self._store is None:
+            return
+        data = await self._store.async_load() or {}
+        for key, record in data.get("devices", {}).items():
+            self.records[key] = {
+                "name": record.get("name"),
+                "last_success": dt_util.parse_datetime(record["last_success"])
+                if record.get("last_success")
+                else None,
+                "last_attempt": dt_util.parse_datetime(record["last_attempt"])
+                if record.get("last_attempt")
+                else None,
+                "last_ok": record.get("last_ok"),
+            }
+
+    def _data_to_save(self) -> dict:
+        return {
+            "devices": {
+                key: {
+                    "name": r["name"],
+                    "last_success": r["last_success"].isoformat() if r["last_success"] else None,
+                    "last_attempt": r["last_attempt"].isoformat() if r["last_attempt"] else None,
+                    "last_ok": r["last_ok"],
+                }
+                for key, r in self.records.items()
+            }
+        }
+
+    def _category(self, record, now: datetime) -> str:
+        if record["last_attempt"] is not None and record["last_ok"] is False:
+            return FAILED
+        last_success = record["last_success"]
+        if last_success is None or now - last_success >= self.stale_after:
+            return STALE
+        return FRESH
+
+    @callback
+    def _update(self, key: str, now: datetime | None = None) -> None:
+        """Recategorize one device, adjust the counters and notify."""
+        now = now or dt_util.utcnow()
+        record = self.records.get(key)
+        new = self._category(record, now) if key in self.categories else None
+        old = self.categories.get(key)
+        if new == FRESH:
+            self._push_expiry(record["last_success"] + self.stale_after, key)
+        if new != old:
+            if old is not None:
+                self.counts[old] -= 1
+            if new is not None:
+                self.counts[new] += 1
+                self.categories[key] = new
+        for listener in list(self._listeners):
+            listener(key)
+        for listener in list(self._key_listeners.get(key, ())):
+            listener(key)
+
+    # -- device lifecycle ---------------------------------------------------
+
+    @callback
+    def add_device(self, key: str, name: str) -> None:
+        """Start tracking a device (called when its handler is registered)."""
+        if key in self.categories:
+            return
+        record = self.records.setdefault(
+            key, {"name": name, "last_success": None, "last_attempt": None, "last_ok": None}
+        )
+        record["name"] = name
+        self.categories[key] = self._category(record, dt_util.utcnow())
+        self.counts[self.categories[key]] += 1
+        self._update(key)
+        for listener in list(self._device_listeners):
+            listener(key)
+
+    @callback
+    def remove_device(self, key: str) -> None:
+        """Stop tracking a device; its record is kept for a later re-add."""
+        category = self.categories.pop(key, None)
+        if category is not None:
+            self.counts[category] -= 1
+            self._update(key)
+
+    @callback
+    def record_result(self, key: str, ok: bool, when: datetime | None = None) -> None:
+        """Record the outcome of a device backup."""
+        record = self.records.get(key)
+        if record is None:
+            return
+        when = when or dt_util.utcnow()
+        record["last_attempt"] = when
+        record["last_ok"] = bool(ok)
+        if ok:
+            record["last_success"] = when
+        self._update(key, when)
+        if self._store is not None:
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    @callback
+    def set_stale_days(self, days: float) -> None:
+        """Change the staleness window and recategorize all devices."""
+        stale_after = timedelta(days=days)
+        if stale_after == self.stale_after:
+            return
+        self.stale_after = stale_after
+        self._expiries = []
+        now = dt_util.utcnow()
+        for key in list(self.categories):
+            self._update(key, now)
+
+    # -- expiry timer ---------------------------------------------------------
+
+    def _push_expiry(self, when: datetime, key: str) -> None:
+        heapq.heappush(self._expiries, (when, key))
+        if self._expiries[0] == (when, key):
+            self._schedule_timer()
+
+    def _schedule_timer(self) -> None:
+        if self.hass is None or async_track_point_in_utc_time is None:
+            return
+        if self._unsub_timer is not None:
+            self._unsub_timer()
+            self._unsub_timer = None
+        if self._expiries:
+            self._unsub_timer = async_track_point_in_utc_time(
+                self.hass, self._handle_expiry, self._expiries[0][0]
+            )
+
+    @callback
+    def _handle_expiry(self, now: datetime) -> None:
+        self._unsub_timer = None
+        while self._expiries and self._expiries[0][0] <= now:
+            _, key = heapq.heappop(self._expiries)
+            # entries of devices that were backed up again since are outdated
+            if self.categories.get(key) == FRESH and self._category(self.records[key], now) != FRESH:
+                self._update(key, now)
+        self._schedule_timer()
+
+    @callback
+    def async_stop(self) -> None:
+        if self._unsub_timer is not None:
+            self._unsub_timer()
+            self._unsub_timer = None
+
+    # -- listeners --------------------------------------------------------------
+
+    @callback
+    def async_add_listener(self, listener, key: str | None = None):
+        """Call `listener(key)` when the health of device `key` changes.
+
+        Without `key` the listener is called for every device.
+        """
+        listeners = (
+            self._listeners if key is None else self._key_listeners.setdefault(key, [])
+        )
+        listeners.append(listener)
+
+        def _remove() -> None:
+            listeners.remove(listener)
+            if key is not None and not listeners:
+                self._key_listeners.pop(key, None)
+
+        return _remove
+
+    @callback
+    def async_add_device_listener(self, listener):
+        """Call `listener(key)` whenever a new device starts being tracked."""
+        self._device_listeners.append(listener)
+        return lambda: self._device_listeners.remove(listener)
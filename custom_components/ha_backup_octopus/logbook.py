@@ -0,0 +1,16 @@
+"""Describe HA Backup Octopus events in the logbook."""
+from homeassistant.core import callback
+
+from . import DOMAIN
+from .report import EVENT_RUN_FINISHED, summary_message
+
+
+@callback
+def async_describe_events(hass, async_describe_event):
+    """Describe the run summary fired after every backup run."""
+
+    @callback
+    def async_describe_run_finished(event):
+        return {"name": "Backup Octopus", "message": summary_message(event.data)}
+
+    async_describe_event(DOMAIN, EVENT_RUN_FINISHED, async_describe_run_finished)
@@ -0,0 +1,101 @@
+"""Optional profiling of a backup run.
+
+Uses yappi when it is installed because it measures wall time across
+coroutines and executor threads. Otherwise falls back to cProfile, which
+only sees the event loop thread (time spent in executor jobs shows up as
+waiting in the awaiting coroutine).
+"""
+import cProfile
+import io
+import logging
+import os
+import pstats
+import time
+
+try:
+    import yappi
+except ImportError:  # pragma: no cover - optional dependency
+    yappi = None
+
+from .const import BACKUPS_FOLDER
+
+_LOGGER = logging.getLogger(__name__)
+
+PROFILES_FOLDER = f"{BACKUPS_FOLDER}/profiles"
+
+
+class RunProfiler:
+    """Capture a profile between `start()` and `stop()` and save it as pstats."""
+
+    # yappi and cProfile both hold global state; only one capture at a time
+    _active = False
+
+    def __init__(self, hass, top: int = 25) -> None:
+        self.hass = hass
+        self.top = top
+        self._profile = None
+
+    def _folder(self) -> str:
+        if self.hass is not None:
+            return self.hass.config.path(PROFILES_FOLDER)
+        return os.path.join("backups", "profiles")
+
+    def start(self) -> bool:
+        """Start profiling; return False if it could not be started."""
+        if RunProfiler._active:
+            _LOGGER.warning("A profile is already being captured; not profiling this run")
+            return False
+        try:
+            if yappi is not None:
+                yappi.clear_stats()
+                yappi.set_clock_type("wall")
+                yappi.start()
+            else:
+                self._profile = cProfile.Profile()
+                self._profile.enable()
+        except Exception as exc:
+            # e.g. Python 3.12+ refuses a second active profiler, such as
+            # Home Assistant's own profiler integration
+            _LOGGER.warning("Could not start profiling; running unprofiled: %s", exc)
+            self._profile = None
+            return False
+        RunProfiler._active = True
+        return True
+
+    async def stop(self) -> str | None:
+        """Stop profiling, write the stats file and log a top-N summary."""
+        try:
+            if yappi is not None:
+                yappi.stop()
+                stats = yappi.get_func_stats()
+            else:
+                self._profile.disable()
+                stats = self._profile
+        finally:
+            RunProfiler._active = False
+
+        if self.hass is not None:
+            return await self.hass.async_add_executor_job(self._write, stats)
+        return self._write(stats)
+
+    def _write(self, stats) -> str | None:
+        folder = self._folder()
+        path = os.path.join(
+            folder, time.strftime("run_backups-%Y%m%d-%H%M%S.prof"))
+        try:
+            os.makedirs(folder, exist_ok=True)
+            if yappi is not None:
+                stats.save(path, type="pstat")
+                yappi.clear_stats()
+            else:
+                stats.dump_stats(path)
+
+            out = io.StringIO()
+            pstats.Stats(path, stream=out).sort_stats(
+                "cumulative").print_stats(self.top)
+        except Exception:
+            _LOGGER.exception("Failed to write backup run profile to %s", path)
+            return None
+
+        _LOGGER.info("Backup run profile written to %s\n%s", path, out.getvalue())
+        return path
@@ -0,0 +1,152 @@
+"""Structured report of a backup run.
+
+Every run of `BackupManager.run_backups` produces one report with a
+record per device: status, error class, timing, bytes and the SHA-256
+digests of the artifacts written. It is saved as JSON (and optionally
+CSV) in REPORTS_FOLDER, always replacing files atomically, and a summary
+is fired as EVENT_RUN_FINISHED, which the logbook platform describes.
+"""
+import csv
+import io
+import json
+import logging
+import os
+import time
+from collections import Counter
+
+from homeassistant.util import dt as dt_util
+
+from .const import BACKUPS_FOLDER
+
+_LOGGER = logging.getLogger(__name__)
+
+REPORTS_FOLDER = f"{BACKUPS_FOLDER}/reports"
+# Copy of the newest report, for dashboards that poll a fixed path
+LATEST_REPORT = "latest.json"
+
+EVENT_RUN_FINISHED = "ha_backup_octopus_run_finished"
+
+CSV_FIELDS = (
+    "device",
+    "handler",
+    "device_id",
+    "status",
+    "error",
+    "message",
+    "started",
+    "duration",
+    "bytes",
+    "artifacts",
+)
+
+
+def summary_message(data: dict) -> str:
+    """Return a one-line summary of a report's event data."""
+    message = (
+        f"backed up {data.get('ok', 0)} of {data.get('devices', 0)} devices "
+        f"({data.get('bytes', 0)} bytes) in {data.get('duration', 0):.0f} s"
+    )
+    if data.get("failed_devices"):
+        message += "; not backed up: " + ", ".join(data["failed_devices"])
+    return message
+
+
+def _write_atomic(path: str, text: str) -> None:
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8", newline="") as fh:
+            fh.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class RunReport:
+    """Collects the per-device results of one backup run."""
+
+    def __init__(self) -> None:
+        self.started = dt_util.utcnow()
+        self.finished = None
+        self.duration = None
+        self.devices = []
+        self._start = time.monotonic()
+
+    def add_device(self, handler, status: str, started, duration: float, error=None) -> dict:
+        """Record the outcome of one device backup.
+
+        `status` is "ok", "failed", "offline", "locked", "interrupted"
+        (cancelled by shutdown) or "skipped" (not started before shutdown,
+        or the handler had no source to back up from).
+        """
+        artifacts = list(getattr(handler, "artifacts", None) or [])
+        record = {
+            "device": getattr(handler, "device_name", None),
+            "handler": type(handler).__name__,
+            "device_id": getattr(handler, "device_id", None),
+            "status": status,
+            "error": type(error).__name__ if error is not None else None,
+            "message": str(error) if error is not None else None,
+            "started": started.isoformat() if started else None,
+            "duration": round(duration, 3),
+            "bytes": sum(a.get("bytes") or 0 for a in artifacts),
+            "artifacts": artifacts,
+        }
+        self.devices.append(record)
+        return record
+
+    def finish(self) -> None:
+        self.finished = dt_util.utcnow()
+        self.duration = round(time.monotonic() - self._start, 3)
+
+    def counts(self) -> Counter:
+        return Counter(record["status"] for record in self.devices)
+
+    def as_dict(self) -> dict:
+        return {
+            "started": self.started.isoformat(),
+            "finished": self.finished.isoformat() if self.finished else None,
+            "duration": self.duration,
+            "statuses": dict(self.counts()),
+            "bytes": sum(record["bytes"] for record in self.devices),
+            "devices": self.devices,
+        }
+
+    def event_data(self, path: str | None = None) -> dict:
+        """Return the compact summary fired as EVENT_RUN_FINISHED."""
+        counts = self.counts()
+        return {
+            "started": self.started.isoformat(),
+            "duration": self.duration,
+            "devices": len(self.devices),
+            "ok": counts.get("ok", 0),
+            "statuses": dict(counts),
+            "bytes": sum(record["bytes"] for record in self.devices),
+            "failed_devices": sorted(
+                str(record["device"]) for record in self.devices if record["status"] != "ok"
+            ),
+            "report": path,
+        }
+
+    def to_csv(self) -> str:
+        out = io.StringIO()
+        writer = csv.DictWriter(out, fieldnames=CSV_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for record in self.devices:
+            writer.writerow({**record, "artifacts": len(record["artifacts"])})
+        return out.getvalue()
+
+    def write(self, folder: str, write_csv: bool = False) -> str:
+        """Write the report to `folder` and return the JSON path (blocking)."""
+        os.makedirs(folder, exist_ok=True)
+        name = dt_util.as_local(self.started).strftime("run-%Y%m%d-%H%M%S")
+        path = os.path.join(folder, f"{name}.json")
+        text = json.dumps(self.as_dict(), ensure_ascii=False, indent=2)
+        _write_atomic(path, text)
+        _write_atomic(os.path.join(folder, LATEST_REPORT), text)
+        if write_csv:
+            _write_atomic(os.path.join(folder, f"{name}.csv"), self.to_csv())
+        return path
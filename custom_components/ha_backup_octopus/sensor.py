@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from homeassistant.components.sensor import SensorEntity, SensorStateClass
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from . import DOMAIN
+from .health import CATEGORIES, FAILED, STALE
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_setup_platform(hass: HomeAssistant, config, async_add_entities: AddEntitiesCallback, discovery_info=None):
+    """Set up the backup health summary sensor."""
+    manager = hass.data.get(DOMAIN)
+    if manager is None:
+        return
+
+    async_add_entities([BackupHealthSensor(manager.health)])
+
+
+class BackupHealthSensor(SensorEntity):
+    """Number of devices whose backup is stale or failed.
+
+    The fresh/stale/failed counts are kept up to date by the health
+    tracker, so a state update is a constant-time read.
+    """
+
+    _attr_should_poll = False
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = "devices"
+
+    def __init__(self, health) -> None:
+        self._health = health
+        self._attr_name = "HA Backup Octopus: Devices needing attention"
+        self._attr_unique_id = "ha_backup_octopus_backup_health"
+        self._attr_icon = "mdi:backup-restore"
+
+    async def async_added_to_hass(self) -> None:
+        @callback
+        def _changed(key: str) -> None:
+            self.async_write_ha_state()
+
+        self.async_on_remove(self._health.async_add_listener(_changed))
+
+    @property
+    def native_value(self) -> int:
+        return self._health.counts[STALE] + self._health.counts[FAILED]
+
+    @property
+    def extra_state_attributes(self) -> dict:
+        counts = {category: self._health.counts[category] for category in CATEGORIES}
+        return {**counts, "total": sum(counts.values())}
@@ -0,0 +1,81 @@
+import asyncio
+import types
+from datetime import timedelta
+
+from homeassistant.util import dt as dt_util
+
+from custom_components.ha_backup_octopus import DOMAIN, binary_sensor
+from custom_components.ha_backup_octopus.health import BackupHealth
+
+
+def test_counts_follow_results_and_expiry():
+    health = BackupHealth(None, stale_days=7)
+    changes = []
+    health.async_add_listener(changes.append)
+
+    health.add_device("WLED:a", "Desk")
+    health.add_device("WLED:b", "Shelf")
+    assert dict(health.counts) == {"fresh": 0, "stale": 2, "failed": 0}
+
+    start = dt_util.utcnow()
+    health.record_result("WLED:a", True, start)
+    health.record_result("WLED:b", False, start)
+    assert dict(health.counts) == {"fresh": 1, "stale": 0, "failed": 1}
+    assert changes[-2:] == ["WLED:a", "WLED:b"]
+
+    # A second success pushes the expiry out; the outdated heap entry is ignored
+    health.record_result("WLED:a", True, start + timedelta(days=3))
+    health._handle_expiry(start + timedelta(days=7))
+    assert health.categories["WLED:a"] == "fresh"
+
+    health._handle_expiry(start + timedelta(days=10))
+    assert health.categories["WLED:a"] == "stale"
+    assert dict(health.counts) == {"fresh": 0, "stale": 1, "failed": 1}
+
+    health.remove_device("WLED:b")
+    assert dict(health.counts) == {"fresh": 0, "stale": 1, "failed": 0}
+
+
+async def test_readded_device_keeps_its_entity():
+    health = BackupHealth(None)
+    health.add_device("WLED:a", "Desk")
+    hass = types.SimpleNamespace(data={DOMAIN: types.SimpleNamespace(health=health)})
+    entities = []
+    await binary_sensor.async_setup_platform(hass, {}, entities.extend)
+    assert [e.unique_id for e in entities] == ["ha_backup_octopus_stale_wled_a"]
+
+    # disabled and re-enabled in the device registry
+    health.remove_device("WLED:a")
+    assert entities[0].available is False
+    health.add_device("WLED:a", "Desk")
+    assert len(entities) == 1 and entities[0].available is True
+
+    health.add_device("WLED:b", "Shelf")
+    assert [e.unique_id for e in entities][1:] == ["ha_backup_octopus_stale_wled_b"]
+
+
+def test_device_listeners_only_hear_their_device():
+    health = BackupHealth(None)
+    calls = {"summary": [], "a": [], "b": []}
+    health.async_add_listener(calls["summary"].append)
+    remove_a = health.async_add_listener(calls["a"].append, "WLED:a")
+    health.async_add_listener(calls["b"].append, "WLED:b")
+
+    health.add_device("WLED:a", "Desk")
+    health.add_device("WLED:b", "Shelf")
+    health.record_result("WLED:a", True)
+
+    assert calls["summary"] == ["WLED:a", "WLED:b", "WLED:a"]
+    assert calls["a"] == ["WLED:a", "WLED:a"]
+    assert calls["b"] == ["WLED:b"]
+
+    remove_a()
+    health.record_result("WLED:a", False)
+    assert calls["a"] == ["WLED:a", "WLED:a"]
+    assert "WLED:a" not in health._key_listeners
+
+
+if __name__ == "__main__":
+    test_counts_follow_results_and_expiry()
+    asyncio.run(test_readded_device_keeps_its_entity())
+    test_device_listeners_only_hear_their_device()
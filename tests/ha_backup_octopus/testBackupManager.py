@@ -0,0 +1,368 @@
+import asyncio
+import os
+import tempfile
+import time
+import types
+
+import voluptuous as vol
+
+from custom_components.ha_backup_octopus import CONFIG_SCHEMA, DOMAIN
+from custom_components.ha_backup_octopus.backup_manager import BackupManager, ConcurrencyLimit
+from custom_components.ha_backup_octopus.const import BACKUPS_FOLDER
+from custom_components.ha_backup_octopus.handlers.base import TEMP_SUFFIX, DeviceBackupHandler
+from custom_components.ha_backup_octopus.handlers.locking import DirectoryLock
+from custom_components.ha_backup_octopus.handlers.shelly import ShellyBackupHandler
+from custom_components.ha_backup_octopus.handlers.wled import WLEDBackupHandler
+from custom_components.ha_backup_octopus.health import device_key
+
+
+class _SlowHandler:
+    def __init__(self, name: str, duration: float = 0.05):
+        self.device_name = name
+        self.device_id = name
+        self.duration = duration
+        self.runs = 0
+        self.finished = 0
+        self.active = 0
+        self.max_active = 0
+
+    async def run_backup(self) -> bool:
+        self.runs += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.duration)
+        finally:
+            self.active -= 1
+        self.finished += 1
+        return True
+
+
+class _StreamingHandler(DeviceBackupHandler):
+    """Writes one chunk of an artifact and then stalls."""
+
+    async def is_online(self) -> bool:
+        return True
+
+    async def fetch_backup(self, folder) -> None:
+        async with self.open_artifact(os.path.join(folder, "big.bin")) as writer:
+            await writer.write(b"x" * 1024)
+            await asyncio.sleep(10)
+
+
+async def test_concurrent_triggers_queue_and_coalesce():
+    manager = BackupManager(None)
+    handler = _SlowHandler("device")
+    manager.register_handler(handler)
+
+    first = asyncio.ensure_future(manager.backup_handler(handler))
+    await asyncio.sleep(0.01)
+    # Both arrive while the first run is in flight: one queued run is
+    # started after it and the other trigger joins that queued run.
+    second = asyncio.ensure_future(manager.backup_handler(handler))
+    third = asyncio.ensure_future(manager.backup_handler(handler))
+
+    assert await asyncio.gather(first, second, third) == [True, True, True]
+    assert handler.runs == 2
+    assert handler.max_active == 1
+
+
+async def test_overlapping_runs_do_not_overlap_devices():
+    manager = BackupManager(None)
+    handlers = [_SlowHandler("a"), _SlowHandler("b")]
+    for handler in handlers:
+        manager.register_handler(handler)
+
+    await asyncio.gather(manager.run_backups(), manager.run_backups())
+
+    for handler in handlers:
+        assert handler.max_active == 1
+
+
+async def test_concurrency_option_applies_to_running_run():
+    manager = BackupManager(None)
+    handlers = [_SlowHandler(str(i)) for i in range(6)]
+    for handler in handlers:
+        manager.register_handler(handler)
+
+    def _active():
+        return sum(h.active for h in handlers)
+
+    run = asyncio.ensure_future(manager.run_backups())
+    await asyncio.sleep(0.01)
+    assert _active() == 1
+
+    # Raising the limit mid-run starts more devices without a restart
+    manager.apply_options({"max_concurrency": 3, "connect_timeout": 2})
+    await asyncio.sleep(0.01)
+    assert _active() == 3
+    await run
+
+    assert all(h.runs == 1 for h in handlers)
+    assert handlers[0].probe_timeout == 3.0
+
+
+async def test_concurrency_limit_hands_slots_to_waiters_in_order():
+    slots = ConcurrencyLimit(1)
+    order = []
+
+    async def _acquire(name):
+        async with slots:
+            order.append(name)
+            await asyncio.sleep(0)
+
+    await slots.__aenter__()
+    waiters = [asyncio.create_task(_acquire(name)) for name in ("first", "second", "third")]
+    await asyncio.sleep(0)
+
+    # a cancelled waiter gives up its place
+    waiters[1].cancel()
+    await asyncio.sleep(0)
+    # releasing and acquiring again at once queues behind the waiters
+    await slots.__aexit__(None, None, None)
+    await _acquire("late")
+    await asyncio.wait_for(asyncio.gather(waiters[0], waiters[2]), 1)
+    assert order == ["first", "third", "late"]
+
+    # a waiter cancelled after being handed the slot passes it on
+    await slots.__aenter__()
+    handed = asyncio.create_task(_acquire("handed"))
+    following = asyncio.create_task(_acquire("following"))
+    await asyncio.sleep(0)
+    await slots.__aexit__(None, None, None)
+    handed.cancel()
+    await asyncio.wait_for(following, 1)
+    assert order[-1] == "following" and slots._active == 0
+
+
+async def test_shutdown_drains_cancels_and_checkpoints():
+    manager = BackupManager(None)
+    manager.apply_options({"max_concurrency": 2})
+    quick = _SlowHandler("quick", 0.05)
+    stuck = _SlowHandler("stuck", 10)
+    queued = _SlowHandler("queued", 0.05)
+    for handler in (quick, stuck, queued):
+        manager.register_handler(handler)
+
+    run = asyncio.ensure_future(manager.run_backups())
+    await asyncio.sleep(0.01)
+    await manager.shutdown(timeout=0.2)
+    await asyncio.wait_for(run, 1)
+
+    # the quick backup was drained, the stuck one cancelled and the
+    # queued one never started
+    assert quick.finished == 1
+    assert stuck.runs == 1 and stuck.finished == 0 and stuck.active == 0
+    assert queued.runs == 0
+    assert manager.checkpoint() == sorted([device_key(stuck), device_key(queued)])
+
+    # nothing starts after shutdown
+    await manager.run_backups()
+    assert queued.runs == 0
+
+
+async def test_checkpointed_devices_run_first():
+    manager = BackupManager(None)
+    handlers = [_SlowHandler(name, 0.01) for name in ("a", "b", "c")]
+    for handler in handlers:
+        manager.register_handler(handler)
+    manager.resume_first = {device_key(handlers[2])}
+
+    order = []
+    for handler in handlers:
+        handler.run_backup = _recording(handler, order)
+    await manager.run_backups()
+
+    assert order == ["c", "a", "b"]
+    assert manager.checkpoint() == []
+
+
+def _recording(handler, order):
+    run_backup = handler.run_backup
+
+    async def _run():
+        order.append(handler.device_name)
+        return await run_backup()
+
+    return _run
+
+
+async def test_cancelled_backup_leaves_no_temp_files():
+    td = tempfile.TemporaryDirectory()
+    manager = BackupManager(None)
+    handler = _StreamingHandler(None, "Big", "10.0.0.9")
+    handler.backup_folder = os.path.join(td.name, "Big", "10.0.0.9")
+    manager.register_handler(handler)
+
+    run = asyncio.ensure_future(manager.run_backups())
+    await asyncio.sleep(0.1)
+    assert os.path.exists(os.path.join(handler.backup_folder, "big.bin" + TEMP_SUFFIX))
+    await manager.shutdown(timeout=0.05)
+    await run
+
+    assert sorted(os.listdir(handler.backup_folder)) == [".octopus.lock"]
+    assert manager.checkpoint() == [device_key(handler)]
+
+    # a temp file left by a killed process is removed by the next run, a
+    # downloaded file that happens to end in .tmp is not
+    leftover = os.path.join(handler.backup_folder, "big.bin" + TEMP_SUFFIX)
+    open(leftover, "wb").close()
+    artifact = os.path.join(handler.backup_folder, "camera.tmp")
+    open(artifact, "wb").close()
+
+    async def _quick_fetch(folder):
+        await handler.write_artifact(os.path.join(folder, "big.bin"), b"done")
+
+    handler.fetch_backup = _quick_fetch
+    assert await handler.run_backup() is True
+    assert not os.path.exists(leftover)
+    assert os.path.exists(artifact)
+
+
+class _ThreadHass:
+    """Runs executor jobs in real threads, like Home Assistant."""
+
+    def async_add_executor_job(self, func, *args):
+        return asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+
+async def test_lock_released_when_cancelled_during_executor_job():
+    td = tempfile.TemporaryDirectory()
+    hass = _ThreadHass()
+    lock = DirectoryLock(hass, td.name)
+    try_acquire = lock._try_acquire
+
+    def _slow_try_acquire():
+        time.sleep(0.2)
+        return try_acquire()
+
+    lock._try_acquire = _slow_try_acquire
+
+    async def _hold():
+        async with lock:
+            await asyncio.sleep(10)
+
+    task = asyncio.ensure_future(_hold())
+    # cancelled while the executor job is still about to take the lock
+    await asyncio.sleep(0.05)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+    # let the executor job finish
+    await asyncio.sleep(0.3)
+    assert lock._fd is None
+    async with DirectoryLock(hass, td.name, timeout=0.5, poll_interval=0.05):
+        pass
+
+
+def test_prune_keeps_folders_of_registry_devices():
+    td = tempfile.TemporaryDirectory()
+    config = types.SimpleNamespace(path=lambda rel: os.path.join(td.name, rel))
+    manager = BackupManager(None)
+    manager.hass = types.SimpleNamespace(config=config)
+    manager.register_handler(WLEDBackupHandler(manager.hass, "Strip", "10.0.0.2"))
+
+    old = time.time() - 10 * 86400
+    folders = {}
+    for name, device_id in (
+        ("Strip", "10.0.0.2"),  # registered
+        ("Plug", "10.0.0.3"),  # disabled, still in the registry
+        ("Lamp", "10.0.0.4"),  # removed from the registry
+    ):
+        folder = folders[name] = config.path(f"{BACKUPS_FOLDER}/{name}/{device_id}")
+        os.makedirs(folder)
+        path = os.path.join(folder, "cfg.json")
+        with open(path, "w") as fh:
+            fh.write("{}")
+        os.utime(path, (old, old))
+
+    manager._prune(7, {"10.0.0.2", "10.0.0.3"})
+    assert os.path.isdir(folders["Strip"]) and os.path.isdir(folders["Plug"])
+    assert not os.path.exists(os.path.dirname(folders["Lamp"]))
+
+
+def test_timeouts_per_handler_type():
+    manager = BackupManager(None)
+    wled = WLEDBackupHandler(None, "Strip", "10.0.0.2")
+    shelly = ShellyBackupHandler(None, "Plug", "10.0.0.3")
+    manager.register_handler(wled)
+    manager.register_handler(shelly)
+
+    manager.set_handler_timeouts({"Shelly": {"read": 5}, "wled": 42, "tasmota": "x"})
+    manager.apply_options({"connect_timeout": 2, "read_timeout": 30})
+
+    assert shelly.timeouts == {"connect": 2, "read": 5, "total": 600}
+    assert wled.timeouts == {"connect": 2, "read": 30, "total": 42}
+    assert "tasmota" not in manager.handler_timeouts
+
+
+def test_option_timeouts_layer_over_yaml():
+    manager = BackupManager(None)
+    wled = WLEDBackupHandler(None, "Strip", "10.0.0.2")
+    shelly = ShellyBackupHandler(None, "Plug", "10.0.0.3")
+    manager.register_handler(wled)
+    manager.register_handler(shelly)
+
+    manager.set_handler_timeouts({"shelly": {"read": 5, "total": 50}, "wled": 42})
+    manager.apply_options({"timeouts": {"shelly": 20}})
+    assert shelly.timeouts == {"connect": 10, "read": 5, "total": 20}
+    assert wled.timeouts["total"] == 42
+
+    manager.apply_options({})
+    assert shelly.timeouts["total"] == 50
+
+
+def test_config_schema():
+    conf = CONFIG_SCHEMA(
+        {DOMAIN: {"encryption_key": "pw", "timeouts": {"Shelly": "30", "esphome": {"connect": 5}}}}
+    )
+    assert conf[DOMAIN]["timeouts"] == {"shelly": 30.0, "esphome": {"connect": 5.0}}
+    assert CONFIG_SCHEMA({DOMAIN: None}) == {DOMAIN: None}
+    for timeouts in ({"shelly": 0}, {"hue": 10}, {"wled": {"total": -1}}):
+        try:
+            CONFIG_SCHEMA({DOMAIN: {"timeouts": timeouts}})
+        except vol.Invalid:
+            pass
+        else:
+            raise AssertionError(f"accepted timeouts {timeouts}")
+
+
+async def test_encryption_key_from_options_wins():
+    manager = BackupManager(None)
+    manager.configured_encryption_key = "from yaml"
+    await manager.async_update_encryption()
+    yaml_encryption = manager.encryption
+    assert yaml_encryption is not None
+
+    # unchanged passphrase: no new derivation
+    manager.apply_options({})
+    await manager.async_update_encryption()
+    assert manager.encryption is yaml_encryption
+
+    manager.apply_options({"encryption_key": "from options"})
+    await manager.async_update_encryption()
+    assert manager.encryption not in (None, yaml_encryption)
+
+    manager.configured_encryption_key = None
+    manager.apply_options({})
+    await manager.async_update_encryption()
+    assert manager.encryption is None
+
+
+if __name__ == "__main__":
+    asyncio.run(test_concurrent_triggers_queue_and_coalesce())
+    asyncio.run(test_overlapping_runs_do_not_overlap_devices())
+    asyncio.run(test_concurrency_option_applies_to_running_run())
+    asyncio.run(test_concurrency_limit_hands_slots_to_waiters_in_order())
+    asyncio.run(test_shutdown_drains_cancels_and_checkpoints())
+    asyncio.run(test_checkpointed_devices_run_first())
+    asyncio.run(test_cancelled_backup_leaves_no_temp_files())
+    test_prune_keeps_folders_of_registry_devices()
+    test_timeouts_per_handler_type()
+    test_option_timeouts_layer_over_yaml()
+    test_config_schema()
+    asyncio.run(test_encryption_key_from_options_wins())
+    asyncio.run(test_lock_released_when_cancelled_during_executor_job())
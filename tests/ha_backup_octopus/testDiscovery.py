@@ -0,0 +1,223 @@
+import types
+
+from custom_components.ha_backup_octopus import discovery as discovery_module
+from custom_components.ha_backup_octopus.backup_manager import BackupManager
+from custom_components.ha_backup_octopus.discovery import DeviceRegistryDiscovery
+from custom_components.ha_backup_octopus.handlers.shelly import ShellyBackupHandler
+from custom_components.ha_backup_octopus.handlers.wled import WLEDBackupHandler
+
+EVENT = discovery_module.dr.EVENT_DEVICE_REGISTRY_UPDATED
+
+
+class _MockDevice:
+    def __init__(self, device_id, manufacturer, host, config_entries=()):
+        self.id = device_id
+        self.name = device_id
+        self.name_by_user = None
+        self.manufacturer = manufacturer
+        self.model = None
+        self.identifiers = set()
+        self.connections = set()
+        self.configuration_url = f"http://{host}" if host else None
+        self.config_entries = set(config_entries)
+        self.disabled = False
+
+
+class _MockRegistry:
+    def __init__(self, devices):
+        self.devices = {device.id: device for device in devices}
+        self.lookups = []
+
+    def async_get(self, device_id):
+        self.lookups.append(device_id)
+        return self.devices.get(device_id)
+
+
+class _MockBus:
+    def __init__(self):
+        self.listeners = {}
+
+    def async_listen(self, event_type, listener):
+        self.listeners[event_type] = listener
+        return lambda: self.listeners.pop(event_type)
+
+    def fire(self, action, device_id):
+        event = types.SimpleNamespace(data={"action": action, "device_id": device_id})
+        self.listeners[EVENT](event)
+
+
+class _MockConfigEntries:
+    def __init__(self, entries):
+        self.entries = entries
+
+    def async_get_entry(self, entry_id):
+        return self.entries.get(entry_id)
+
+
+class _RecordingManager(BackupManager):
+    def __init__(self):
+        super().__init__(None)
+        self.calls = []
+
+    def register_handler(self, handler) -> bool:
+        self.calls.append(("register", type(handler).__name__, handler.device_id))
+        return super().register_handler(handler)
+
+    def unregister_handler(self, handler) -> None:
+        self.calls.append(("unregister", type(handler).__name__, handler.device_id))
+        super().unregister_handler(handler)
+
+
+def _entry(entry_id, host):
+    return types.SimpleNamespace(
+        entry_id=entry_id, domain="shelly", title=None, data={"host": host})
+
+
+def _setup(devices):
+    registry = _MockRegistry(devices)
+    hass = types.SimpleNamespace(
+        bus=_MockBus(),
+        config_entries=_MockConfigEntries(
+            {
+                "shelly-entry": _entry("shelly-entry", "10.0.0.3"),
+                "late-entry": _entry("late-entry", "10.0.0.6"),
+            }
+        ),
+    )
+    manager = _RecordingManager()
+    discovery = DeviceRegistryDiscovery(
+        hass, manager, [WLEDBackupHandler, ShellyBackupHandler])
+    return hass, registry, manager, discovery
+
+
+def _run_with_registry(registry, func):
+    real = discovery_module.dr
+    discovery_module.dr = types.SimpleNamespace(
+        async_get=lambda hass: registry, EVENT_DEVICE_REGISTRY_UPDATED=EVENT)
+    try:
+        func()
+    finally:
+        discovery_module.dr = real
+
+
+def test_start_scans_registry_once_and_skips_entry_devices():
+    hass, registry, manager, discovery = _setup(
+        [
+            _MockDevice("strip", "WLED", "10.0.0.2"),
+            # covered by config-entry discovery of the Shelly integration
+            _MockDevice("plug", "Shelly", "10.0.0.3", ["shelly-entry"]),
+            _MockDevice("mqtt-plug", "Shelly", "10.0.0.4"),
+            _MockDevice("lamp", "IKEA", "10.0.0.5"),
+        ]
+    )
+    # what config-entry discovery in async_setup registered
+    for entry_handler in ShellyBackupHandler.create_handlers_from_entry(
+        hass, hass.config_entries.async_get_entry("shelly-entry")
+    ):
+        manager.register_handler(entry_handler)
+    manager.calls.clear()
+
+    _run_with_registry(registry, discovery.async_start)
+
+    assert sorted(registry.lookups) == ["lamp", "mqtt-plug", "plug", "strip"]
+    assert manager.calls == [
+        ("register", "WLEDBackupHandler", "10.0.0.2"),
+        ("register", "ShellyBackupHandler", "10.0.0.4"),
+    ]
+
+    # the entry's handler is not discovery's to remove
+    hass.bus.fire("remove", "plug")
+    assert len(manager.device_handlers) == 3
+    assert EVENT in hass.bus.listeners
+
+    discovery.async_stop()
+    assert EVENT not in hass.bus.listeners
+
+
+def test_registry_events_register_and_unregister_handlers():
+    hass, registry, manager, discovery = _setup([])
+    _run_with_registry(registry, discovery.async_start)
+
+    def _events():
+        # create
+        registry.devices["strip"] = _MockDevice("strip", "WLED", "10.0.0.2")
+        hass.bus.fire("create", "strip")
+        assert manager.calls == [("register", "WLEDBackupHandler", "10.0.0.2")]
+
+        # update without relevant changes keeps the handler
+        registry.devices["strip"].name_by_user = "Desk"
+        hass.bus.fire("update", "strip")
+        assert len(manager.calls) == 1
+
+        # new host: the handler is replaced
+        registry.devices["strip"].configuration_url = "http://10.0.0.9"
+        hass.bus.fire("update", "strip")
+        assert manager.calls[1:] == [
+            ("unregister", "WLEDBackupHandler", "10.0.0.2"),
+            ("register", "WLEDBackupHandler", "10.0.0.9"),
+        ]
+
+        # disabled devices are not backed up
+        registry.devices["strip"].disabled = True
+        hass.bus.fire("update", "strip")
+        assert manager.calls[-1] == ("unregister", "WLEDBackupHandler", "10.0.0.9")
+        assert manager.device_handlers == []
+
+        registry.devices["strip"].disabled = False
+        hass.bus.fire("update", "strip")
+        assert manager.calls[-1] == ("register", "WLEDBackupHandler", "10.0.0.9")
+
+        # remove
+        del registry.devices["strip"]
+        hass.bus.fire("remove", "strip")
+        assert manager.calls[-1] == ("unregister", "WLEDBackupHandler", "10.0.0.9")
+        assert manager.device_handlers == []
+
+    _run_with_registry(registry, _events)
+
+
+def test_known_device_ids_include_disabled_devices():
+    disabled = _MockDevice("old-strip", "WLED", "10.0.0.7")
+    disabled.disabled = True
+    hass, registry, manager, discovery = _setup(
+        [
+            _MockDevice("strip", "WLED", "10.0.0.2"),
+            _MockDevice("plug", "Shelly", "10.0.0.3", ["shelly-entry"]),
+            disabled,
+            _MockDevice("lamp", "IKEA", "10.0.0.5"),
+        ]
+    )
+
+    known = []
+    _run_with_registry(registry, lambda: known.append(discovery.known_device_ids()))
+    assert known == [{"10.0.0.2", "10.0.0.3", "10.0.0.7"}]
+    assert manager.calls == []
+
+
+def test_entry_device_added_after_start_gets_handler_from_entry():
+    hass, registry, manager, discovery = _setup([])
+    _run_with_registry(registry, discovery.async_start)
+
+    def _events():
+        registry.devices["late"] = _MockDevice("late", "Shelly", None, ["late-entry"])
+        hass.bus.fire("create", "late")
+        assert manager.calls == [("register", "ShellyBackupHandler", "10.0.0.6")]
+        (handler,) = manager.device_handlers
+        assert handler.entry is hass.config_entries.async_get_entry("late-entry")
+
+        # evaluating again keeps the handler
+        hass.bus.fire("update", "late")
+        assert len(manager.calls) == 1
+
+        del registry.devices["late"]
+        hass.bus.fire("remove", "late")
+        assert manager.calls[-1] == ("unregister", "ShellyBackupHandler", "10.0.0.6")
+
+    _run_with_registry(registry, _events)
+
+
+if __name__ == "__main__":
+    test_start_scans_registry_once_and_skips_entry_devices()
+    test_registry_events_register_and_unregister_handlers()
+    test_known_device_ids_include_disabled_devices()
+    test_entry_device_added_after_start_gets_handler_from_entry()
@@ -0,0 +1,89 @@
+import asyncio
+import pathlib
+import tempfile
+
+from custom_components.ha_backup_octopus.handlers.esphome import ESPHomeBackupHandler
+
+
+class _MockResp:
+    def __init__(self, data: bytes, status: int = 200):
+        self._data = data
+        self.status = status
+
+    async def read(self):
+        return self._data
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+class _MockSession:
+    def __init__(self, payloads):
+        self.payloads = payloads
+
+    def get(self, url: str, **kwargs):
+        if url not in self.payloads:
+            return _MockResp(b"", status=404)
+        return _MockResp(self.payloads[url])
+
+    async def close(self):
+        return None
+
+
+class _MockDashboard:
+    url = "http://dashboard:6052"
+    data = {"kitchen-sensor": {"configuration": "kitchen-sensor.yaml"}}
+
+
+class _MockEntry:
+    entry_id = "abc"
+    title = "Kitchen Sensor"
+    data = {"host": "192.168.1.60", "device_name": "kitchen-sensor", "noise_psk": "key"}
+
+
+async def test_esphome_yaml_from_dashboard():
+    td = tempfile.TemporaryDirectory()
+    folder = pathlib.Path(td.name)
+
+    handler = ESPHomeBackupHandler.create_handlers_from_entry(None, _MockEntry())[0]
+    handler.backup_folder = str(folder)
+    handler.dashboard = lambda: _MockDashboard()
+
+    session = _MockSession(
+        {
+            "http://dashboard:6052/devices": b"{}",
+            "http://dashboard:6052/edit?configuration=kitchen-sensor.yaml": b"esphome:\n  name: kitchen-sensor\n",
+        }
+    )
+
+    async def _fake_get_clientsession():
+        return session, True
+
+    handler.get_clientsession = _fake_get_clientsession
+
+    assert await handler.run_backup() is True
+    assert (folder / "kitchen-sensor.yaml").read_bytes().startswith(b"esphome:")
+    assert (folder / "entry.json").exists()
+
+
+async def test_esphome_without_dashboard_is_not_a_success():
+    td = tempfile.TemporaryDirectory()
+    folder = pathlib.Path(td.name)
+
+    handler = ESPHomeBackupHandler.create_handlers_from_entry(None, _MockEntry())[0]
+    handler.backup_folder = str(folder)
+    handler.dashboard = lambda: None
+
+    assert await handler.run_backup() is False
+    assert handler.last_status == "skipped"
+    assert type(handler.last_error).__name__ == "BackupSkipped"
+    # the config entry with the API key is still saved
+    assert (folder / "entry.json").exists()
+
+
+if __name__ == "__main__":
+    asyncio.run(test_esphome_yaml_from_dashboard())
+    asyncio.run(test_esphome_without_dashboard_is_not_a_success())
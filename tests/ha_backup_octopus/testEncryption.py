@@ -0,0 +1,215 @@
+import asyncio
+import os
+import pathlib
+import tempfile
+
+from custom_components.ha_backup_octopus.backup_manager import BackupManager
+from custom_components.ha_backup_octopus.handlers.encryption import (
+    CHUNK_SIZE,
+    LEGACY_MAGIC,
+    MAGIC,
+    ArtifactEncryption,
+    DecryptionError,
+    derive_master_key,
+)
+from custom_components.ha_backup_octopus.handlers.base import TEMP_SUFFIX
+from custom_components.ha_backup_octopus.handlers.wled import WLEDBackupHandler
+
+
+def _encrypt(encryption, data: bytes, step: int = 10_000) -> bytes:
+    encryptor = encryption.encryptor()
+    out = [encryptor.update(data[i:i + step]) for i in range(0, len(data), step)]
+    out.append(encryptor.finalize())
+    return b"".join(out)
+
+
+def _decrypt(encryption, base: pathlib.Path, ciphertext: bytes) -> bytes:
+    src = base / "artifact.enc"
+    dst = base / "artifact"
+    src.write_bytes(ciphertext)
+    encryption.decrypt_file(str(src), str(dst))
+    return dst.read_bytes()
+
+
+def test_stream_roundtrip_and_tamper_detection():
+    td = tempfile.TemporaryDirectory()
+    base = pathlib.Path(td.name)
+    encryption = ArtifactEncryption.from_passphrase("correct horse")
+
+    for data in (b"", b"x", os.urandom(CHUNK_SIZE), os.urandom(3 * CHUNK_SIZE + 17)):
+        ciphertext = _encrypt(encryption, data)
+        assert _decrypt(encryption, base, ciphertext) == data
+
+    ciphertext = _encrypt(encryption, os.urandom(2 * CHUNK_SIZE + 5))
+    last_frame = len(ciphertext) - (5 + 16 + 4)
+
+    for broken in (
+        ciphertext[:-1] + bytes([ciphertext[-1] ^ 1]),  # flipped bit
+        ciphertext[:last_frame],  # final frame dropped
+    ):
+        try:
+            _decrypt(encryption, base, broken)
+        except DecryptionError:
+            pass
+        else:
+            raise AssertionError("tampered artifact decrypted")
+
+    other = ArtifactEncryption.from_passphrase("wrong")
+    try:
+        _decrypt(other, base, ciphertext)
+    except DecryptionError:
+        pass
+    else:
+        raise AssertionError("artifact decrypted with the wrong key")
+
+
+def test_key_salt_is_random_and_carried_in_header():
+    td = tempfile.TemporaryDirectory()
+    base = pathlib.Path(td.name)
+    first = ArtifactEncryption.from_passphrase("correct horse")
+    second = ArtifactEncryption.from_passphrase("correct horse")
+
+    ciphertext = _encrypt(first, b"payload")
+    assert ciphertext.startswith(MAGIC) and ciphertext[len(MAGIC)] == 17
+    assert ciphertext != _encrypt(second, b"payload")
+    # another installation only needs the passphrase
+    assert _decrypt(second, base, ciphertext) == b"payload"
+
+    # a key without the passphrase cannot derive other salts
+    salt = os.urandom(16)
+    keyed = ArtifactEncryption(derive_master_key("correct horse", salt), salt)
+    try:
+        _decrypt(keyed, base, ciphertext)
+    except DecryptionError:
+        pass
+    else:
+        raise AssertionError("artifact decrypted without its key salt")
+
+
+def test_legacy_format_still_decrypts():
+    td = tempfile.TemporaryDirectory()
+    base = pathlib.Path(td.name)
+    # files of the first format: fixed key salt, N = 2**14, no cost in header
+    legacy_key = derive_master_key("correct horse", b"ha_backup_octopus", 14)
+    salt = os.urandom(16)
+    cipher = ArtifactEncryption._file_cipher(legacy_key, salt)
+    header = LEGACY_MAGIC + salt
+    data = os.urandom(CHUNK_SIZE + 3)
+    frames = [
+        cipher.encrypt(bytes(11) + b"\x00", data[:CHUNK_SIZE], header),
+        cipher.encrypt((1).to_bytes(11, "big") + b"\x01", data[CHUNK_SIZE:], header),
+    ]
+    ciphertext = header + b"".join(len(f).to_bytes(4, "big") + f for f in frames)
+
+    encryption = ArtifactEncryption.from_passphrase("correct horse")
+    assert _decrypt(encryption, base, ciphertext) == data
+
+
+class _MockResp:
+    status = 200
+
+    def __init__(self, data: bytes):
+        self._data = data
+
+    async def read(self):
+        return self._data
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+class _MockSession:
+    def get(self, url: str, **kwargs):
+        return _MockResp(b'{"wifi":{"psk":"secret"}}')
+
+    async def close(self):
+        return None
+
+
+async def test_handler_writes_encrypted_artifacts():
+    td = tempfile.TemporaryDirectory()
+    folder = pathlib.Path(td.name)
+    (folder / "cfg.json").write_bytes(b"old plaintext")
+
+    handler = WLEDBackupHandler(None, "WLED Kitchen", "192.168.1.20")
+    handler.backup_folder = str(folder)
+    handler.encryption = ArtifactEncryption.from_passphrase("correct horse")
+
+    async def _fake_get_clientsession():
+        return _MockSession(), True
+
+    handler.get_clientsession = _fake_get_clientsession
+
+    assert await handler.run_backup() is True
+    assert not (folder / "cfg.json").exists()
+    assert b"secret" not in (folder / "cfg.json.enc").read_bytes()
+    assert not list(folder.glob("*" + TEMP_SUFFIX))
+
+    handler.encryption.decrypt_file(
+        str(folder / "cfg.json.enc"), str(folder / "cfg.json"))
+    assert (folder / "cfg.json").read_bytes() == b'{"wifi":{"psk":"secret"}}'
+
+
+class _MockStore:
+    def __init__(self):
+        self.data = None
+        self.saves = 0
+
+    async def async_load(self):
+        return self.data
+
+    async def async_save(self, data):
+        self.saves += 1
+        self.data = data
+
+
+class _ExecutorHass:
+    def __init__(self):
+        self.jobs = []
+
+    async def async_add_executor_job(self, func, *args):
+        self.jobs.append(func)
+        return func(*args)
+
+
+async def test_manager_derives_key_in_executor():
+    manager = BackupManager(None)
+    handler = WLEDBackupHandler(None, "WLED Kitchen", "192.168.1.20")
+    manager.register_handler(handler)
+    manager.hass = _ExecutorHass()
+
+    await manager.async_set_encryption_key("correct horse")
+    assert manager.hass.jobs == [ArtifactEncryption.from_passphrase]
+    assert handler.encryption is manager.encryption is not None
+
+    await manager.async_set_encryption_key(None)
+    assert handler.encryption is None
+
+
+async def test_manager_keeps_key_salt():
+    store = _MockStore()
+    manager = BackupManager(None)
+    manager._encryption_store = store
+
+    await manager.async_set_encryption_key("correct horse")
+    header = _encrypt(manager.encryption, b"")[:len(MAGIC) + 17]
+    assert store.saves == 1 and bytes.fromhex(store.data["salt"]) == header[-16:]
+
+    # after a restart the same salt is used again
+    restarted = BackupManager(None)
+    restarted._encryption_store = store
+    await restarted.async_set_encryption_key("correct horse")
+    assert _encrypt(restarted.encryption, b"")[:len(header)] == header
+    assert store.saves == 1
+
+
+if __name__ == "__main__":
+    test_stream_roundtrip_and_tamper_detection()
+    test_key_salt_is_random_and_carried_in_header()
+    test_legacy_format_still_decrypts()
+    asyncio.run(test_handler_writes_encrypted_artifacts())
+    asyncio.run(test_manager_derives_key_in_executor())
+    asyncio.run(test_manager_keeps_key_salt())
@@ -4,19 +4,35 @@ import os
 import pathlib
 import tempfile
 
+from custom_components.ha_backup_octopus.backup_manager import BackupManager
 from custom_components.ha_backup_octopus.handlers.generic_download import (
     GenericDownloadBackupHandler,
 )
 
 
 class _MockResp:
-    def __init__(self, data: bytes, status: int = 200):
+    def __init__(self, data: bytes, status: int = 200, headers=None, fail_after=None):
         self._data = data
         self.status = status
+        self.headers = headers or {}
+        self.fail_after = fail_after
 
     async def read(self):
         return self._data
 
+    async def json(self, content_type=None):
+        return json.loads(self._data)
+
+    @property
+    def content(self):
+        return self
+
+    async def iter_chunked(self, size: int):
+        for start in range(0, len(self._data), size):
+            if self.fail_after is not None and start >= self.fail_after:
+                raise ConnectionResetError("connection dropped")
+            yield self._data[start:start + size]
+
     async def __aenter__(self):
         return self
 
@@ -28,14 +44,41 @@ class _MockSession:
     def __init__(self, payloads):
         self.payloads = payloads
         self.closed = False
+        self.requests = []
 
-    def get(self, url: str):
+    def get(self, url: str, **kwargs):
         return _MockResp(self.payloads.get(url, b""))
 
+    def request(self, method: str, url: str, **kwargs):
+        self.requests.append((method, url, kwargs))
+        return self.get(url)
+
     async def close(self):
         self.closed = True
 
 
+class _RangeSession(_MockSession):
+    """Serves one file, honouring Range/If-Range like a real web server."""
+
+    def __init__(self, data: bytes, etag='"v1"', ranges=True):
+        super().__init__({})
+        self.data = data
+        self.etag = etag
+        self.ranges = ranges
+        self.fail_after = None
+
+    def request(self, method: str, url: str, **kwargs):
+        headers = kwargs.get("headers") or {}
+        self.requests.append((method, url, dict(headers)))
+        fail_after, self.fail_after = self.fail_after, None
+        reply = {"ETag": self.etag}
+        if self.ranges and "Range" in headers and headers.get("If-Range") == self.etag:
+            start = int(headers["Range"][len("bytes="):-1])
+            reply["Content-Range"] = f"bytes {start}-{len(self.data) - 1}/{len(self.data)}"
+            return _MockResp(self.data[start:], 206, reply, fail_after)
+        return _MockResp(self.data, 200, reply, fail_after)
+
+
 class _MockConfig:
     def __init__(self, base):
         self.base = base
@@ -138,6 +181,237 @@ async def test_generic_download_missing_config_disables_handler():
     assert result is True
 
 
+async def test_generic_download_login_session_reused():
+    td = tempfile.TemporaryDirectory()
+    base = pathlib.Path(td.name)
+
+    config_path = base / "ha_backup_octopus_backups" / "generic_downloads.json"
+    config_path.parent.mkdir(parents=True, exist_ok=True)
+    config = {
+        "hosts": {
+            "router.lan": {
+                "headers": {"X-Client": "octopus"},
+                "variables": {"user": "admin"},
+                "login": {
+                    "url": "http://router.lan/login",
+                    "json": {"username": "${user}", "password": "secret"},
+                    "extract": {"sid": "session.id"},
+                },
+            },
+            "nas.lan": {"auth": {"type": "bearer", "token": "abc"}},
+        },
+        "downloads": [
+            {
+                "folder": "router",
+                "url": "http://router.lan/export?sid=${sid}",
+                "filename": "export.cfg",
+            },
+            {
+                "folder": "router",
+                "url": "http://router.lan/settings?sid=${sid}",
+                "filename": "settings.json",
+            },
+            {
+                "folder": "nas",
+                "url": "http://nas.lan/config",
+                "filename": "nas.cfg",
+                "method": "post",
+                "body": "format=tar",
+            },
+        ],
+    }
+    config_path.write_text(json.dumps(config), encoding="utf-8")
+
+    hass = _MockHass(str(base))
+    handler = GenericDownloadBackupHandler.create_handlers_from_entry(hass, None)[0]
+
+    default_session = _MockSession({"http://nas.lan/config": b"nas"})
+    login_session = _MockSession(
+        {
+            "http://router.lan/login": b'{"session": {"id": "42"}}',
+            "http://router.lan/export?sid=42": b"export",
+            "http://router.lan/settings?sid=42": b"settings",
+        }
+    )
+    logins = []
+
+    async def _fake_get_clientsession():
+        return default_session, False
+
+    def _fake_login_session():
+        logins.append(login_session)
+        return login_session
+
+    handler.get_clientsession = _fake_get_clientsession
+    handler.create_login_session = _fake_login_session
+
+    assert await handler.run_backup() is True
+
+    # One login for the router host, reused for both router downloads
+    assert len(logins) == 1
+    method, url, kwargs = login_session.requests[0]
+    assert (method, url) == ("POST", "http://router.lan/login")
+    assert kwargs["json"] == {"username": "admin", "password": "secret"}
+    assert [r[1] for r in login_session.requests[1:]] == [
+        "http://router.lan/export?sid=42",
+        "http://router.lan/settings?sid=42",
+    ]
+    assert login_session.requests[1][2]["headers"] == {"X-Client": "octopus"}
+    assert login_session.closed is True
+
+    method, url, kwargs = default_session.requests[0]
+    assert method == "POST"
+    assert kwargs["headers"] == {"Authorization": "Bearer abc"}
+    assert kwargs["data"] == "format=tar"
+
+    folder = base / "ha_backup_octopus_backups" / handler.device_name / handler.device_id
+    assert (folder / "router" / "export.cfg").read_bytes() == b"export"
+    assert (folder / "nas" / "nas.cfg").read_bytes() == b"nas"
+
+
+async def test_generic_download_timeouts_and_bandwidth():
+    td = tempfile.TemporaryDirectory()
+    base = pathlib.Path(td.name)
+
+    config_path = base / "ha_backup_octopus_backups" / "generic_downloads.json"
+    config_path.parent.mkdir(parents=True, exist_ok=True)
+    config = {
+        "timeouts": {"connect": 2, "read": 5},
+        "bandwidth": {"hosts": {"nas.lan": 10_000_000}},
+        "downloads": [
+            {
+                "folder": "nas",
+                "url": "http://nas.lan/big.tar",
+                "filename": "big.tar",
+                "timeout": 900,
+            },
+            {"folder": "cam", "url": "http://cam.lan/cfg", "filename": "cfg"},
+        ],
+    }
+    config_path.write_text(json.dumps(config), encoding="utf-8")
+
+    hass = _MockHass(str(base))
+    handler = GenericDownloadBackupHandler.create_handlers_from_entry(hass, None)[0]
+    payload = os.urandom(200_000)
+    session = _MockSession({"http://nas.lan/big.tar": payload, "http://cam.lan/cfg": b"cfg"})
+
+    async def _fake_get_clientsession():
+        return session, False
+
+    handler.get_clientsession = _fake_get_clientsession
+
+    assert await handler.run_backup() is True
+
+    big_timeout = session.requests[0][2]["timeout"]
+    assert (big_timeout.sock_connect, big_timeout.sock_read, big_timeout.total) == (2, 5, 900)
+    assert session.requests[1][2]["timeout"].total == 600
+    assert handler.bandwidth.is_limited("nas.lan")
+    assert not handler.bandwidth.is_limited("cam.lan")
+
+    folder = base / "ha_backup_octopus_backups" / handler.device_name / handler.device_id
+    assert (folder / "nas" / "big.tar").read_bytes() == payload
+
+
+async def test_generic_download_bandwidth_survives_options_changes():
+    td = tempfile.TemporaryDirectory()
+    base = pathlib.Path(td.name)
+    config_path = base / "ha_backup_octopus_backups" / "generic_downloads.json"
+    config_path.parent.mkdir(parents=True, exist_ok=True)
+    config = {
+        "bandwidth": {"global": 50000},
+        "downloads": [{"folder": "nas", "url": "http://nas.lan/a", "filename": "a"}],
+    }
+    config_path.write_text(json.dumps(config), encoding="utf-8")
+
+    manager = BackupManager(None)
+    handler = GenericDownloadBackupHandler.create_handlers_from_entry(
+        _MockHass(str(base)), None)[0]
+    manager.register_handler(handler)
+    assert await handler._ensure_downloads_loaded()
+    assert manager.bandwidth.global_rate == 50000
+
+    # unrelated option edits keep the limit from the config file
+    manager.apply_options({"stale_days": 3})
+    assert manager.bandwidth.global_rate == 50000
+
+    # the lower of the two limits applies
+    manager.apply_options({"bandwidth_limit": 10})
+    assert manager.bandwidth.global_rate == 10 * 1024
+    manager.apply_options({"bandwidth_limit": 100})
+    assert manager.bandwidth.global_rate == 50000
+    manager.apply_options({})
+    assert manager.bandwidth.global_rate == 50000
+
+
+def _resume_handler(base, session):
+    config_path = base / "ha_backup_octopus_backups" / "generic_downloads.json"
+    config_path.parent.mkdir(parents=True, exist_ok=True)
+    config = {
+        "downloads": [
+            {"folder": "nas", "url": "http://nas.lan/big.tar", "filename": "big.tar"},
+        ],
+    }
+    config_path.write_text(json.dumps(config), encoding="utf-8")
+    handler = GenericDownloadBackupHandler.create_handlers_from_entry(
+        _MockHass(str(base)), None)[0]
+
+    async def _fake_get_clientsession():
+        return session, False
+
+    handler.get_clientsession = _fake_get_clientsession
+    folder = base / "ha_backup_octopus_backups" / handler.device_name / handler.device_id
+    return handler, folder / "nas"
+
+
+async def test_generic_download_resumes_partial_download():
+    td = tempfile.TemporaryDirectory()
+    payload = os.urandom(300_000)
+    session = _RangeSession(payload)
+    handler, folder = _resume_handler(pathlib.Path(td.name), session)
+
+    # The connection drops after the first three chunks
+    session.fail_after = 3 * handler.CHUNK_SIZE
+    assert await handler.run_backup() is False
+    assert not (folder / "big.tar").exists()
+    assert (folder / "big.tar.part").stat().st_size == 3 * handler.CHUNK_SIZE
+
+    assert await handler.run_backup() is True
+    assert session.requests[-1][2]["Range"] == f"bytes={3 * handler.CHUNK_SIZE}-"
+    assert session.requests[-1][2]["If-Range"] == '"v1"'
+    assert (folder / "big.tar").read_bytes() == payload
+    assert sorted(os.listdir(folder)) == ["big.tar"]
+
+
+async def test_generic_download_restarts_when_resume_is_not_possible():
+    td = tempfile.TemporaryDirectory()
+    payload = os.urandom(200_000)
+    session = _RangeSession(payload)
+    handler, folder = _resume_handler(pathlib.Path(td.name), session)
+
+    session.fail_after = handler.CHUNK_SIZE
+    assert await handler.run_backup() is False
+
+    # The file changed on the server: If-Range fails and all of it is sent
+    session.data = payload = os.urandom(150_000)
+    session.etag = '"v2"'
+    assert await handler.run_backup() is True
+    assert (folder / "big.tar").read_bytes() == payload
+
+    # A server without range support always sends the whole file
+    session.ranges = False
+    session.fail_after = handler.CHUNK_SIZE
+    assert await handler.run_backup() is False
+    assert await handler.run_backup() is True
+    assert "Range" in session.requests[-1][2]
+    assert (folder / "big.tar").read_bytes() == payload
+    assert sorted(os.listdir(folder)) == ["big.tar"]
+
+
 if __name__ == "__main__":
     asyncio.run(test_generic_download_backup())
+    asyncio.run(test_generic_download_login_session_reused())
+    asyncio.run(test_generic_download_timeouts_and_bandwidth())
     asyncio.run(test_generic_download_missing_config_disables_handler())
+    asyncio.run(test_generic_download_resumes_partial_download())
+    asyncio.run(test_generic_download_restarts_when_resume_is_not_possible())
+    asyncio.run(test_generic_download_bandwidth_survives_options_changes())
@@ -0,0 +1,94 @@
+import asyncio
+import os
+import tempfile
+
+from custom_components.ha_backup_octopus import profiling
+from custom_components.ha_backup_octopus.backup_manager import BackupManager
+from custom_components.ha_backup_octopus.profiling import PROFILES_FOLDER, RunProfiler
+
+
+class _MockConfig:
+    def __init__(self, base):
+        self.base = base
+
+    def path(self, rel_path: str):
+        return os.path.join(self.base, rel_path)
+
+
+class _MockBus:
+    def async_fire(self, event_type, data):
+        pass
+
+
+class _MockHass:
+    def __init__(self, base):
+        self.config = _MockConfig(base)
+        self.bus = _MockBus()
+
+    async def async_add_executor_job(self, func, *args, **kwargs):
+        return func(*args, **kwargs)
+
+
+class _Handler:
+    def __init__(self):
+        self.device_name = "device"
+        self.device_id = "device"
+        self.runs = 0
+
+    async def run_backup(self) -> bool:
+        self.runs += 1
+        await asyncio.sleep(0.01)
+        return True
+
+
+class _BusyProfile:
+    """Stands in for cProfile when another profiler is already active."""
+
+    def enable(self):
+        raise ValueError("Another profiling tool is already active")
+
+
+def _manager(base):
+    manager = BackupManager(None)
+    manager.hass = _MockHass(base)
+    handler = _Handler()
+    manager.register_handler(handler)
+    return manager, handler
+
+
+async def test_profiled_run_writes_stats():
+    td = tempfile.TemporaryDirectory()
+    manager, handler = _manager(td.name)
+
+    await manager.run_backups(profile=True)
+
+    assert handler.runs == 1
+    profiles = manager.hass.config.path(PROFILES_FOLDER)
+    assert [name for name in os.listdir(profiles) if name.endswith(".prof")]
+    assert RunProfiler._active is False
+
+
+async def test_run_continues_when_profiler_cannot_start():
+    td = tempfile.TemporaryDirectory()
+    manager, handler = _manager(td.name)
+    yappi, profile_cls = profiling.yappi, profiling.cProfile.Profile
+    profiling.yappi = None
+    profiling.cProfile.Profile = _BusyProfile
+    try:
+        await manager.run_backups(profile=True)
+    finally:
+        profiling.yappi, profiling.cProfile.Profile = yappi, profile_cls
+
+    assert handler.runs == 1
+    assert RunProfiler._active is False
+    assert not os.path.exists(manager.hass.config.path(PROFILES_FOLDER))
+
+    # the next profiled run is not blocked by the failed one
+    await manager.run_backups(profile=True)
+    assert handler.runs == 2
+    assert os.listdir(manager.hass.config.path(PROFILES_FOLDER))
+
+
+if __name__ == "__main__":
+    asyncio.run(test_profiled_run_writes_stats())
+    asyncio.run(test_run_continues_when_profiler_cannot_start())
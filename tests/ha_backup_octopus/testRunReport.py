@@ -0,0 +1,108 @@
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import tempfile
+
+from custom_components.ha_backup_octopus.backup_manager import BackupManager
+from custom_components.ha_backup_octopus.handlers.base import DeviceBackupHandler
+from custom_components.ha_backup_octopus.report import EVENT_RUN_FINISHED, REPORTS_FOLDER
+
+
+class _MockConfig:
+    def __init__(self, base):
+        self.base = base
+
+    def path(self, rel_path: str):
+        return os.path.join(self.base, rel_path)
+
+
+class _MockBus:
+    def __init__(self):
+        self.events = []
+
+    def async_fire(self, event_type, data):
+        self.events.append((event_type, data))
+
+
+class _MockHass:
+    def __init__(self, base):
+        self.config = _MockConfig(base)
+        self.bus = _MockBus()
+
+    async def async_add_executor_job(self, func, *args, **kwargs):
+        return func(*args, **kwargs)
+
+
+class _Handler(DeviceBackupHandler):
+    def __init__(self, hass, name, online=True, error=None):
+        super().__init__(hass, name, name.lower())
+        self.online = online
+        self.error = error
+
+    async def is_online(self) -> bool:
+        return self.online
+
+    async def fetch_backup(self, folder) -> None:
+        await self.write_artifact(os.path.join(folder, "config.json"), b'{"a": 1}')
+        if self.error is not None:
+            raise self.error
+        await self.write_artifact(os.path.join(folder, "presets.json"), b"[]")
+
+
+async def test_run_report_written_and_fired():
+    td = tempfile.TemporaryDirectory()
+    hass = _MockHass(td.name)
+    manager = BackupManager(None)
+    # only the report needs hass; health and checkpoint stay in memory
+    manager.hass = hass
+    manager.apply_options({"report_csv": True})
+
+    handlers = [
+        _Handler(hass, "Good"),
+        _Handler(hass, "Offline", online=False),
+        _Handler(hass, "Broken", error=ConnectionResetError("reset by peer")),
+    ]
+    for handler in handlers:
+        manager.register_handler(handler)
+
+    await manager.run_backups()
+
+    reports = hass.config.path(REPORTS_FOLDER)
+    with open(os.path.join(reports, "latest.json"), encoding="utf-8") as fh:
+        report = json.load(fh)
+    assert report["statuses"] == {"ok": 1, "offline": 1, "failed": 1}
+    records = {record["device"]: record for record in report["devices"]}
+
+    good = records["Good"]
+    assert good["error"] is None and good["duration"] >= 0
+    assert [a["path"] for a in good["artifacts"]] == ["config.json", "presets.json"]
+    for artifact in good["artifacts"]:
+        with open(os.path.join(handlers[0].backup_folder, artifact["path"]), "rb") as fh:
+            data = fh.read()
+        assert artifact["sha256"] == hashlib.sha256(data).hexdigest()
+        assert artifact["bytes"] == len(data)
+    assert good["bytes"] == 10
+
+    assert records["Offline"]["status"] == "offline"
+    assert records["Broken"]["error"] == "ConnectionResetError"
+    assert records["Broken"]["message"] == "reset by peer"
+    # the artifact written before the failure is still reported
+    assert records["Broken"]["bytes"] == 8
+
+    latest, run_csv, run_json = sorted(os.listdir(reports))
+    assert latest == "latest.json" and run_csv[:-4] == run_json[:-5]
+    with open(os.path.join(reports, run_csv), encoding="utf-8", newline="") as fh:
+        rows = list(csv.DictReader(fh))
+    assert [row["status"] for row in rows] == [r["status"] for r in report["devices"]]
+
+    ((event_type, data),) = hass.bus.events
+    assert event_type == EVENT_RUN_FINISHED
+    assert (data["devices"], data["ok"], data["bytes"]) == (3, 1, 18)
+    assert data["failed_devices"] == ["Broken", "Offline"]
+    assert data["report"] == os.path.join(reports, run_json)
+
+
+if __name__ == "__main__":
+    asyncio.run(test_run_report_written_and_fired())
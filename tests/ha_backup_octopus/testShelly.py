@@ -0,0 +1,129 @@
+import asyncio
+import json
+import pathlib
+import tempfile
+
+from custom_components.ha_backup_octopus.handlers.shelly import ShellyBackupHandler
+
+
+class _MockResp:
+    def __init__(self, data: bytes, status: int = 200):
+        self._data = data
+        self.status = status
+
+    async def read(self):
+        return self._data
+
+    async def json(self, content_type=None):
+        return json.loads(self._data)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+class _MockSession:
+    def __init__(self, payloads):
+        self.payloads = payloads
+        self.urls = []
+        self.closed = 0
+
+    def get(self, url: str, **kwargs):
+        self.urls.append(url)
+        if url not in self.payloads:
+            return _MockResp(b"", status=404)
+        return _MockResp(self.payloads[url])
+
+    async def close(self):
+        self.closed += 1
+
+
+async def test_shelly_gen2_backup_with_scripts():
+    td = tempfile.TemporaryDirectory()
+    folder = pathlib.Path(td.name)
+    host = "192.168.1.30"
+    session = _MockSession(
+        {
+            f"http://{host}/shelly": b'{"gen": 2}',
+            f"http://{host}/rpc/Shelly.GetConfig": b'{"sys":{}}',
+            f"http://{host}/rpc/Script.List": b'{"scripts":[{"id":1,"name":"night light"}]}',
+            f"http://{host}/rpc/Script.GetCode?id=1&offset=0": b'{"data":"let a","left":3}',
+            f"http://{host}/rpc/Script.GetCode?id=1&offset=5": b'{"data":"=1;","left":0}',
+        }
+    )
+
+    handler = ShellyBackupHandler(None, "Shelly Plus 1", host)
+    handler.backup_folder = str(folder)
+
+    async def _fake_get_clientsession():
+        return session, True
+
+    handler.get_clientsession = _fake_get_clientsession
+
+    assert await handler.run_backup() is True
+    assert handler.gen == 2
+    assert (folder / "config.json").read_bytes() == b'{"sys":{}}'
+    assert (folder / "scripts" / "1_night_light.js").read_text() == "let a=1;"
+
+
+async def test_shelly_script_offsets_count_bytes():
+    td = tempfile.TemporaryDirectory()
+    folder = pathlib.Path(td.name)
+    host = "192.168.1.32"
+    first = json.dumps({"data": "// Küche ", "left": 7}).encode()
+    session = _MockSession(
+        {
+            f"http://{host}/shelly": b'{"gen": 2}',
+            f"http://{host}/rpc/Shelly.GetConfig": b'{"sys":{}}',
+            f"http://{host}/rpc/Script.List": b'{"scripts":[{"id":2,"name":"kitchen"}]}',
+            f"http://{host}/rpc/Script.GetCode?id=2&offset=0": first,
+            # "// Küche " is 9 characters but 10 bytes
+            f"http://{host}/rpc/Script.GetCode?id=2&offset=10": b'{"data":"let b=2;","left":0}',
+        }
+    )
+
+    handler = ShellyBackupHandler(None, "Shelly Plus 2PM", host)
+    handler.backup_folder = str(folder)
+
+    async def _fake_get_clientsession():
+        return session, True
+
+    handler.get_clientsession = _fake_get_clientsession
+
+    assert await handler.run_backup() is True
+    code = (folder / "scripts" / "2_kitchen.js").read_text(encoding="utf-8")
+    assert code == "// Küche let b=2;"
+
+
+async def test_shelly_gen1_backup():
+    td = tempfile.TemporaryDirectory()
+    folder = pathlib.Path(td.name)
+    host = "192.168.1.31"
+    session = _MockSession(
+        {
+            f"http://{host}/shelly": b'{"type":"SHSW-1"}',
+            f"http://{host}/settings": b'{"name":"pump"}',
+            f"http://{host}/settings/actions": b'{"actions":{}}',
+        }
+    )
+
+    handler = ShellyBackupHandler(None, "Shelly 1", host, username="admin", password="pw")
+    handler.backup_folder = str(folder)
+
+    async def _fake_get_clientsession():
+        return session, True
+
+    handler.get_clientsession = _fake_get_clientsession
+
+    assert await handler.run_backup() is True
+    assert handler.gen == 1
+    assert (folder / "settings.json").read_bytes() == b'{"name":"pump"}'
+    assert (folder / "actions.json").exists()
+
+
+if __name__ == "__main__":
+    asyncio.run(test_shelly_gen2_backup_with_scripts())
+    asyncio.run(test_shelly_script_offsets_count_bytes())
+    asyncio.run(test_shelly_gen1_backup())
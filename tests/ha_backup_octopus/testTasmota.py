@@ -0,0 +1,71 @@
+import asyncio
+import pathlib
+import tempfile
+
+from custom_components.ha_backup_octopus.handlers.tasmota import TasmotaBackupHandler
+
+
+class _MockResp:
+    def __init__(self, data: bytes, status: int = 200):
+        self._data = data
+        self.status = status
+
+    async def read(self):
+        return self._data
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+class _MockSession:
+    def __init__(self, payloads):
+        self.payloads = payloads
+
+    def get(self, url: str, **kwargs):
+        if url not in self.payloads:
+            return _MockResp(b"", status=404)
+        return _MockResp(self.payloads[url])
+
+    async def close(self):
+        return None
+
+
+class _MockDevice:
+    name = "Garage Plug"
+    name_by_user = None
+    configuration_url = "http://192.168.1.40/"
+
+
+async def test_tasmota_backup():
+    td = tempfile.TemporaryDirectory()
+    folder = pathlib.Path(td.name)
+
+    handlers = TasmotaBackupHandler.create_handlers_from_device(None, _MockDevice())
+    assert len(handlers) == 1
+    handler = handlers[0]
+    assert handler.device_id == "192.168.1.40"
+    handler.backup_folder = str(folder)
+
+    session = _MockSession(
+        {
+            "http://192.168.1.40/cm?cmnd=Status": b'{"Status":{}}',
+            "http://192.168.1.40/dl": b"\x00\x01binary-dump",
+            "http://192.168.1.40/cm?cmnd=Status%200": b'{"StatusFWR":{}}',
+        }
+    )
+
+    async def _fake_get_clientsession():
+        return session, True
+
+    handler.get_clientsession = _fake_get_clientsession
+
+    assert await handler.run_backup() is True
+    assert (folder / "Config.dmp").read_bytes() == b"\x00\x01binary-dump"
+    assert (folder / "status.json").read_bytes() == b'{"StatusFWR":{}}'
+
+
+if __name__ == "__main__":
+    asyncio.run(test_tasmota_backup())
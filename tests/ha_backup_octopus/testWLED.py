@@ -2,12 +2,17 @@ import asyncio
 import tempfile
 import pathlib
 
+from custom_components.ha_backup_octopus.backup_manager import BackupManager
+from custom_components.ha_backup_octopus.discovery import DeviceRegistryDiscovery
 from custom_components.ha_backup_octopus.handlers.wled import WLEDBackupHandler
 
 
 class _MockResp:
-    def __init__(self, data: bytes):
+    def __init__(self, data: bytes, status: int = 200, headers=None):
         self._data = data
+        self.status = status
+        self.headers = headers or {}
+        self.content_length = len(data)
 
     async def read(self):
         return self._data
@@ -20,7 +25,7 @@ class _MockResp:
 
 
 class _MockSession:
-    def get(self, url: str):
+    def get(self, url: str, **kwargs):
         # return predictable mock payloads for cfg and presets
         if url.endswith("/cfg.json"):
             return _MockResp(b'{"mock":"cfg"}')
@@ -62,5 +67,83 @@ async def test_wled_backup():
     assert presets.exists(), f"Expected presets.json at {presets}"
 
 
+class _PlanSession(_MockSession):
+    """Answers HEAD for cfg.json only; presets.json needs a range request."""
+
+    def __init__(self):
+        self.requests = []
+
+    def head(self, url: str, **kwargs):
+        self.requests.append(("HEAD", url, kwargs.get("headers")))
+        if url.endswith("/cfg.json"):
+            return _MockResp(b"x" * 1234)
+        return _MockResp(b"", status=405)
+
+    def get(self, url: str, **kwargs):
+        self.requests.append(("GET", url, kwargs.get("headers")))
+        if url.endswith("/presets.json"):
+            return _MockResp(b"{", status=206, headers={"Content-Range": "bytes 0-0/4321"})
+        return super().get(url, **kwargs)
+
+
+async def test_wled_plan_does_not_download():
+    td = tempfile.TemporaryDirectory()
+    handler = WLEDBackupHandler(None, "WLED Living Room", "192.168.173.133")
+    handler.backup_folder = str(pathlib.Path(td.name) / "backup")
+    session = _PlanSession()
+
+    async def _fake_get_clientsession():
+        return session, False
+
+    handler.get_clientsession = _fake_get_clientsession
+
+    manager = BackupManager(None)
+    manager.register_handler(handler)
+    manager.apply_options({"bandwidth_limit": 1})
+    report = await manager.plan_backups()
+
+    assert report["device_count"] == 1 and report["online"] == 1
+    assert report["requests"] == 2
+    assert report["bytes"] == 1234 + 4321
+    assert report["unknown_size"] == 0
+    # 5555 bytes at 1 kB/s
+    assert report["estimated_duration"] >= 5.4
+    assert [r["bytes"] for r in report["devices"][0]["requests"]] == [1234, 4321]
+    assert ("GET", "http://192.168.173.133/presets.json", {"Range": "bytes=0-0"}) in session.requests
+    assert not pathlib.Path(handler.backup_folder).exists()
+
+
+class _MockDevice:
+    def __init__(self, manufacturer, configuration_url=None, name="Desk Strip"):
+        self.id = "dev1"
+        self.name = name
+        self.name_by_user = None
+        self.manufacturer = manufacturer
+        self.model = "ESP32"
+        self.identifiers = {("mqtt", "abc")}
+        self.connections = {("mac", "aa:bb:cc:dd:ee:ff")}
+        self.configuration_url = configuration_url
+        self.config_entries = set()
+        self.disabled = False
+
+
+def test_wled_device_registry_matching():
+    discovery = DeviceRegistryDiscovery(None, BackupManager(None), [WLEDBackupHandler])
+
+    wled = _MockDevice("WLED", "http://192.168.1.50")
+    assert discovery._matching_classes(wled) == [WLEDBackupHandler]
+    assert discovery._matching_classes(_MockDevice("Shelly")) == []
+
+    handlers = discovery._create_handlers(wled)
+    assert len(handlers) == 1
+    assert handlers[0].device_id == "192.168.1.50"
+    assert handlers[0].device_name == "Desk Strip"
+
+    # Without a configuration URL the host is unknown
+    assert discovery._create_handlers(_MockDevice("WLED")) == []
+
+
 if __name__ == "__main__":
     asyncio.run(test_wled_backup())
+    asyncio.run(test_wled_plan_does_not_download())
+    test_wled_device_registry_matching()